@@ -4,11 +4,32 @@
 # API Flask pour prédire le prix des avocats en utilisant le modèle XGBoost
 # ============================================================================
 
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import pandas as pd
-import joblib
 import os
+import sys
+import time
+import uuid
+
+from cpu_config import nombre_threads, limiter_threads, epingler, configurer_modele
+
+# Threads d'inférence de ce worker (booster XGBoost et OpenMP / BLAS) : les
+# plafonds doivent être posés avant le premier import de numpy.
+# Une valeur <= 0 (ex. -1) signifie tous les cœurs
+NTHREAD = nombre_threads(int(os.environ.get('AVOCADO_NTHREAD', '1')))
+limiter_threads(NTHREAD)
+
+# Épinglage optionnel du worker sur des CPU ("0-3,6"), un jeu par worker
+CPU_AFFINITY = epingler(os.environ.get('AVOCADO_CPU_AFFINITY', ''))
+
+from flask import Flask, request, jsonify, Response  # noqa: E402
+from flask_cors import CORS  # noqa: E402
+import pandas as pd  # noqa: E402
+import numpy as np  # noqa: E402
+
+from jobs import JobManager  # noqa: E402
+from drift import DriftMonitor  # noqa: E402
+from prediction_log import PredictionLogger, horodatage, nouvel_enregistrement  # noqa: E402
+from shadow import ShadowEvaluator  # noqa: E402
+from schema import Schema, FEATURES, FEATURES_OPTIONNELLES, lire_dates, resumer_erreurs  # noqa: E402
 
 # Initialisation de l'application Flask
 app = Flask(__name__)
@@ -18,18 +39,358 @@ CORS(app)  # Permet les requêtes cross-origin pour le frontend
 # CHARGEMENT DU MODÈLE
 # =============================================================================
 
-# Chemin vers le fichier pickle du modèle
-MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'model', 'avocado_price_model.pkl')
+# Moteur d'inférence : "pipeline" (pickle scikit-learn + xgboost) ou
+# "lite" (modèle distillé évalué en NumPy pur, voir model/distill_model.py)
+ENGINE = os.environ.get('AVOCADO_ENGINE', 'pipeline')
+
+# Chemins vers les fichiers du modèle
+MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'model')
+MODEL_PATH = os.path.join(MODEL_DIR, 'avocado_price_model.pkl')
+LITE_MODEL_PATH = os.path.join(MODEL_DIR, 'avocado_price_model_lite.npz')
+QUANTILE_MODEL_PATH = os.path.join(MODEL_DIR, 'avocado_quantile_model.pkl')
+LITE_QUANTILE_MODEL_PATH = os.path.join(MODEL_DIR, 'avocado_quantile_model_lite.npz')
+
+# Noms des quantiles renvoyés dans "interval" (ordre croissant)
+NOMS_QUANTILES = ['p10', 'p50', 'p90']
 
 # Chargement du modèle au démarrage
 try:
-    model = joblib.load(MODEL_PATH)
-    print(f"✅ Modèle chargé avec succès depuis : {MODEL_PATH}")
-except FileNotFoundError:
-    print(f"❌ Erreur : Le fichier modèle n'a pas été trouvé à : {MODEL_PATH}")
-    print("   Veuillez d'abord exécuter le script avocado_prediction.py pour générer le modèle.")
+    if ENGINE == 'lite':
+        from lite_model import LiteModel
+        model = LiteModel.load(LITE_MODEL_PATH)
+        print(f"✅ Modèle léger chargé avec succès depuis : {LITE_MODEL_PATH}")
+    else:
+        import joblib
+        model = joblib.load(MODEL_PATH)
+        print(f"✅ Modèle chargé avec succès depuis : {MODEL_PATH}")
+except FileNotFoundError as e:
+    print(f"❌ Erreur : Le fichier modèle n'a pas été trouvé : {e.filename}")
+    if ENGINE == 'lite':
+        print("   Veuillez d'abord exécuter le script distill_model.py pour générer le modèle léger.")
+    else:
+        print("   Veuillez d'abord exécuter le script avocado_prediction.py pour générer le modèle.")
     model = None
 
+# Modèle de quantiles optionnel (intervalles de prédiction), entraîné sur la
+# sortie du même préprocesseur que le modèle principal
+quantile_model = None
+try:
+    if model is not None and ENGINE == 'lite':
+        quantile_model = LiteModel.load(LITE_QUANTILE_MODEL_PATH)
+        n_features_quantiles = quantile_model.n_features
+        n_features_modele = model.n_features
+    elif model is not None:
+        quantile_model = joblib.load(QUANTILE_MODEL_PATH)
+        n_features_quantiles = quantile_model.n_features_in_
+        n_features_modele = model.named_steps['regressor'].n_features_in_
+    if quantile_model is not None:
+        if n_features_quantiles != n_features_modele:
+            print("⚠️ Modèle de quantiles incompatible avec le modèle principal : intervalles désactivés")
+            quantile_model = None
+        else:
+            print("✅ Modèle de quantiles chargé : intervalles de prédiction activés")
+except FileNotFoundError:
+    print("ℹ️ Pas de modèle de quantiles : les prédictions sont renvoyées sans intervalle")
+
+# Modèle candidat optionnel (pickle ou modèle léger .npz), évalué en ombre sur
+# une fraction du trafic sans jamais être renvoyé aux clients (voir shadow.py)
+SHADOW_MODEL_PATH = os.environ.get('AVOCADO_SHADOW_MODEL', '')
+SHADOW_FRACTION = float(os.environ.get('AVOCADO_SHADOW_FRACTION', '0.1'))
+
+shadow_model = None
+if SHADOW_MODEL_PATH and model is not None:
+    try:
+        if SHADOW_MODEL_PATH.endswith('.npz'):
+            from lite_model import LiteModel
+            shadow_model = LiteModel.load(SHADOW_MODEL_PATH)
+        else:
+            import joblib
+            shadow_model = joblib.load(SHADOW_MODEL_PATH)
+        print(f"✅ Modèle candidat chargé (ombre, {SHADOW_FRACTION:.0%} du trafic) : {SHADOW_MODEL_PATH}")
+    except FileNotFoundError:
+        print(f"❌ Erreur : Le modèle candidat n'a pas été trouvé : {SHADOW_MODEL_PATH}")
+
+# Le n_jobs sauvegardé avec les modèles est remplacé par AVOCADO_NTHREAD
+for modele_charge in (model, quantile_model, shadow_model):
+    configurer_modele(modele_charge, NTHREAD)
+print(f"🧵 Inférence : {NTHREAD} thread(s) par worker"
+      + (f", CPU {sorted(CPU_AFFINITY)}" if CPU_AFFINITY else ""))
+
+# Liste des features requises pour la prédiction (définitions dans schema.py)
+FEATURES_REQUISES = list(FEATURES)
+
+
+def colonnes_du_modele(modele):
+    """Colonnes d'entrée attendues par le modèle chargé (pipeline ou moteur léger)"""
+    if hasattr(modele, 'colonnes_numeriques'):
+        return modele.colonnes_numeriques + modele.colonnes_categoriques
+    return list(modele.named_steps['preprocessor'].feature_names_in_)
+
+
+def categories_du_modele(modele):
+    """Modalités connues de chaque colonne catégorique (pipeline ou moteur léger)"""
+    if hasattr(modele, 'colonnes_categoriques'):
+        return dict(zip(modele.colonnes_categoriques, modele.categories))
+    categories = {}
+    for _, transformeur, colonnes in modele.named_steps['preprocessor'].transformers_:
+        if hasattr(transformeur, 'categories_'):
+            categories.update(zip(colonnes, transformeur.categories_))
+    return categories
+
+
+# =============================================================================
+# FEATURE STORE (FEATURES TEMPORELLES)
+# =============================================================================
+
+# Les modèles entraînés avec les features temporelles (semaine, prix décalés,
+# moyennes glissantes) ont besoin du feature store généré par avocado_prediction.py
+FEATURE_STORE_PATH = os.path.join(MODEL_DIR, 'avocado_feature_store.pkl')
+feature_store = None
+
+# Le fichier est relu quand il change (semaines ajoutées avec
+# "python feature_store.py --ajouter ..."), vérifié au plus toutes les N secondes
+FEATURE_STORE_CHECK = float(os.environ.get('AVOCADO_FEATURE_STORE_CHECK', '10'))
+feature_store_mtime = None
+prochaine_verification_store = 0.0
+colonnes_modele = colonnes_du_modele(model) if model is not None else FEATURES_REQUISES
+colonnes_candidat = colonnes_du_modele(shadow_model) if shadow_model is not None else FEATURES_REQUISES
+
+
+def utilise_features_temporelles(colonnes):
+    return any(col not in FEATURES_REQUISES for col in colonnes)
+
+
+if utilise_features_temporelles(colonnes_modele) or utilise_features_temporelles(colonnes_candidat):
+    sys.path.insert(0, MODEL_DIR)
+    from feature_store import FeatureStore
+    try:
+        feature_store_mtime = os.path.getmtime(FEATURE_STORE_PATH)
+        feature_store = FeatureStore.charger(FEATURE_STORE_PATH)
+        print(f"✅ Feature store chargé : {len(feature_store.features)} séries (region, type)")
+    except FileNotFoundError:
+        print(f"❌ Erreur : Le feature store n'a pas été trouvé à : {FEATURE_STORE_PATH}")
+        print("   Le modèle utilise des features temporelles : relancez avocado_prediction.py.")
+        if utilise_features_temporelles(colonnes_modele):
+            model = None
+        shadow_model = None
+
+
+def feature_store_courant():
+    """Feature store chargé, relu si le fichier a été remplacé depuis le dernier chargement"""
+    global feature_store, feature_store_mtime, prochaine_verification_store
+    maintenant = time.monotonic()
+    if feature_store is None or maintenant < prochaine_verification_store:
+        return feature_store
+    prochaine_verification_store = maintenant + FEATURE_STORE_CHECK
+    try:
+        mtime = os.path.getmtime(FEATURE_STORE_PATH)
+        if mtime != feature_store_mtime:
+            feature_store = FeatureStore.charger(FEATURE_STORE_PATH)
+            feature_store_mtime = mtime
+            print(f"🔄 Feature store rechargé : {len(feature_store.features)} séries (region, type)")
+    except Exception as e:
+        # Fichier absent ou illisible : le store déjà chargé reste utilisé
+        print(f"⚠️ Feature store non rechargé : {e}")
+    return feature_store
+
+
+def preparer_entree(df, colonnes=None):
+    """
+    Sélectionne et convertit les colonnes requises d'un DataFrame d'entrée,
+    puis ajoute les features temporelles du feature store si le modèle les utilise
+    (la colonne optionnelle "Date" fixe alors la semaine de la prédiction).
+    `colonnes` : colonnes du modèle à alimenter (modèle principal par défaut)
+    """
+    manquantes = [f for f in FEATURES_REQUISES if f not in df.columns]
+    if manquantes:
+        raise ValueError(f'Features manquantes : {manquantes}')
+    entree = df[FEATURES_REQUISES].copy()
+    for col, definition in FEATURES.items():
+        if definition['type'] != 'category':
+            # Le schéma accepte les chaînes numériques ("2023.0") : conversion avant le typage
+            entree[col] = pd.to_numeric(entree[col])
+        entree[col] = entree[col].astype(TYPES_PANDAS[definition['type']])
+
+    store = feature_store_courant()
+    if store is not None:
+        if 'Date' in df.columns:
+            entree['Date'] = lire_dates(df['Date'].to_numpy())
+        entree = store.enrichir(entree)[colonnes or colonnes_modele]
+    return entree
+
+
+# Types pandas des features après validation par le schéma
+TYPES_PANDAS = {'float': float, 'int': int, 'category': str}
+
+
+def predire(entree):
+    """
+    Retourne (prédictions, quantiles, durée) pour un DataFrame préparé
+
+    Avec un modèle de quantiles, l'entrée n'est prétraitée qu'une fois et la
+    matrice est partagée entre le régresseur principal et le booster
+    multi-quantiles (un seul appel pour p10, p50 et p90). Sinon quantiles vaut None.
+    La durée (s) ne couvre que la prédiction ponctuelle (prétraitement et
+    régresseur), comparable à la latence mesurée pour le modèle candidat.
+    """
+    debut = time.perf_counter()
+    if quantile_model is None:
+        predictions = model.predict(entree)
+        return predictions, None, time.perf_counter() - debut
+
+    if ENGINE == 'lite':
+        matrice = model.transform(entree)
+        predictions = model.predict_matrix(matrice)
+        duree = time.perf_counter() - debut
+        quantiles = quantile_model.predict_matrix(matrice)
+    else:
+        matrice = model.named_steps['preprocessor'].transform(entree)
+        predictions = model.named_steps['regressor'].predict(matrice)
+        duree = time.perf_counter() - debut
+        quantiles = quantile_model.predict(matrice)
+
+    # Tri par ligne : des quantiles estimés séparément peuvent se croiser
+    return predictions, np.sort(quantiles, axis=1), duree
+
+
+def formater_intervalle(quantiles_ligne):
+    """Intervalle JSON d'une ligne ({'p10': ..., 'p50': ..., 'p90': ...})"""
+    return {nom: round(float(v), 2) for nom, v in zip(NOMS_QUANTILES, quantiles_ligne)}
+
+
+def predire_morceau(df):
+    """
+    Prédit un morceau de fichier pour les jobs : colonnes d'entrée + prédiction.
+    Les lignes refusées par le schéma sont conservées sans prédiction, avec
+    leurs erreurs dans la colonne "errors" (ex. "year:not_integer")
+    """
+    if model is None:
+        raise RuntimeError('Le modèle n\'est pas chargé.')
+    manquantes = [f for f in FEATURES_REQUISES if f not in df.columns]
+    if manquantes:
+        raise ValueError(f'Features manquantes : {manquantes}')
+
+    valides, erreurs = schema.valider(df)
+    resultat = df[FEATURES_REQUISES].copy()
+    resultat['prediction'] = np.nan
+    if quantile_model is not None:
+        for nom in NOMS_QUANTILES:
+            resultat[nom] = np.nan
+
+    if valides.any():
+        predictions, quantiles, _ = predire(preparer_entree(df[valides]))
+        resultat.loc[valides, 'prediction'] = np.round(predictions, 2)
+        if quantiles is not None:
+            for j, nom in enumerate(NOMS_QUANTILES):
+                resultat.loc[valides, nom] = np.round(quantiles[:, j], 2)
+
+    colonne_erreurs = np.full(len(df), '', dtype=object)
+    for ligne in erreurs:
+        colonne_erreurs[ligne['index']] = resumer_erreurs(ligne['errors'])
+    resultat['errors'] = colonne_erreurs
+    return resultat
+
+
+# =============================================================================
+# SCHÉMA DE VALIDATION DES ENTRÉES
+# =============================================================================
+
+# Compilé une fois à partir des définitions de schema.py et des modalités
+# connues du modèle (une région inconnue du modèle est refusée)
+schema = Schema(categories=categories_du_modele(model) if model is not None else None)
+
+# =============================================================================
+# JOBS DE PRÉDICTION ASYNCHRONES
+# =============================================================================
+
+# Répertoire de travail des jobs (base SQLite + fichiers découpés)
+JOBS_DIR = os.environ.get('AVOCADO_JOBS_DIR', os.path.join(os.path.dirname(__file__), 'jobs_data'))
+JOBS_WORKERS = int(os.environ.get('AVOCADO_JOBS_WORKERS', '2'))
+JOBS_CHUNKSIZE = int(os.environ.get('AVOCADO_JOBS_CHUNKSIZE', '100000'))
+
+# Seul répertoire dont les CSV peuvent être soumis par {"path": ...} (vide : désactivé)
+JOBS_INPUT_DIR = os.environ.get('AVOCADO_JOBS_INPUT_DIR', '')
+
+job_manager = JobManager(predire_morceau, JOBS_DIR, max_workers=JOBS_WORKERS, chunksize=JOBS_CHUNKSIZE,
+                         dossier_entrees=JOBS_INPUT_DIR or None)
+
+# Avec le reloader Flask (debug=True), le script est exécuté deux fois : seuls
+# les threads du processus qui sert réellement les requêtes sont démarrés
+PROCESSUS_SERVEUR = __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+
+if PROCESSUS_SERVEUR:
+    job_manager.demarrer()
+
+# =============================================================================
+# SURVEILLANCE DE LA DÉRIVE DES ENTRÉES
+# =============================================================================
+
+# Statistiques de référence générées par avocado_prediction.py
+DRIFT_REFERENCE_PATH = os.path.join(MODEL_DIR, 'drift_reference.json')
+DRIFT_PERIODE = float(os.environ.get('AVOCADO_DRIFT_PERIOD', '5'))
+
+try:
+    drift_monitor = DriftMonitor.depuis_fichier(DRIFT_REFERENCE_PATH, periode=DRIFT_PERIODE)
+    if PROCESSUS_SERVEUR:
+        drift_monitor.demarrer()
+except FileNotFoundError:
+    print("ℹ️ Pas de statistiques de référence (drift_reference.json) : surveillance de la dérive désactivée")
+    drift_monitor = None
+
+# =============================================================================
+# JOURNAL DES PRÉDICTIONS
+# =============================================================================
+
+# Entrées et sorties de /predict et /predict_batch, écrites en arrière-plan
+# (NDJSON gzip) pour le réentraînement (voir model/replay_log.py).
+# AVOCADO_PREDICTION_LOG_DIR vide : journal désactivé
+PREDICTION_LOG_DIR = os.environ.get(
+    'AVOCADO_PREDICTION_LOG_DIR', os.path.join(os.path.dirname(__file__), 'prediction_logs')
+)
+PREDICTION_LOG_POLICY = os.environ.get('AVOCADO_PREDICTION_LOG_POLICY', 'drop')
+PREDICTION_LOG_QUEUE = int(os.environ.get('AVOCADO_PREDICTION_LOG_QUEUE', '10000'))
+PREDICTION_LOG_MAX_MB = float(os.environ.get('AVOCADO_PREDICTION_LOG_MAX_MB', '64'))
+
+prediction_logger = None
+if PREDICTION_LOG_DIR:
+    prediction_logger = PredictionLogger(
+        PREDICTION_LOG_DIR,
+        taille_file=PREDICTION_LOG_QUEUE,
+        politique=PREDICTION_LOG_POLICY,
+        taille_max_fichier=int(PREDICTION_LOG_MAX_MB * 1024 * 1024)
+    )
+    if PROCESSUS_SERVEUR:
+        prediction_logger.demarrer()
+
+
+def journaliser(identifiants, entrees, predictions, quantiles):
+    """Dépose les prédictions d'une requête dans le journal (sans écriture disque)"""
+    if prediction_logger is None:
+        return
+    instant = horodatage()
+    prediction_logger.enregistrer([
+        nouvel_enregistrement(
+            identifiant, instant, entree, round(float(pred), 2),
+            formater_intervalle(quantiles[i]) if quantiles is not None else None,
+            ENGINE
+        )
+        for i, (identifiant, entree, pred) in enumerate(zip(identifiants, entrees, predictions))
+    ])
+
+# =============================================================================
+# ÉVALUATION EN OMBRE DU MODÈLE CANDIDAT
+# =============================================================================
+
+def preparer_entree_candidat(df):
+    return preparer_entree(df, colonnes_candidat)
+
+
+shadow_evaluator = None
+if shadow_model is not None:
+    shadow_evaluator = ShadowEvaluator(shadow_model, preparer_entree_candidat, fraction=SHADOW_FRACTION)
+    if PROCESSUS_SERVEUR:
+        shadow_evaluator.demarrer()
+
 # =============================================================================
 # ROUTES DE L'API
 # =============================================================================
@@ -45,7 +406,14 @@ def home():
             '/': 'Page d\'accueil (GET)',
             '/health': 'Vérification de santé (GET)',
             '/predict': 'Prédiction du prix (POST)',
-            '/features': 'Liste des features requises (GET)'
+            '/predict_batch': 'Prédiction par lot (POST)',
+            '/features': 'Liste des features requises (GET)',
+            '/jobs': 'Soumission (POST) et liste (GET) des jobs de prédiction asynchrones',
+            '/jobs/<id>': 'Statut et progression d\'un job (GET)',
+            '/jobs/<id>/result': 'Téléchargement des résultats d\'un job (GET)',
+            '/monitoring/drift': 'Dérive des entrées par rapport à l\'entraînement (GET)',
+            '/monitoring/prediction_log': 'État du journal des prédictions (GET)',
+            '/shadow/stats': 'Écarts et latence du modèle candidat évalué en ombre (GET)'
         }
     })
 
@@ -57,6 +425,11 @@ def health():
     return jsonify({
         'status': 'healthy' if model_loaded else 'unhealthy',
         'model_loaded': model_loaded,
+        'engine': ENGINE,
+        'intervals': quantile_model is not None,
+        'shadow': shadow_evaluator is not None,
+        'nthread': NTHREAD,
+        'cpu_affinity': sorted(CPU_AFFINITY) if CPU_AFFINITY else None,
         'message': 'Le modèle est prêt' if model_loaded else 'Le modèle n\'est pas chargé'
     })
 
@@ -67,16 +440,10 @@ def get_features():
     return jsonify({
         'status': 'success',
         'features': {
-            'Quality1': 'Volume d\'avocats calibre 4046 (float)',
-            'Quality2': 'Volume d\'avocats calibre 4225 (float)',
-            'Quality3': 'Volume d\'avocats calibre 4770 (float)',
-            'Small Bags': 'Nombre de petits sacs (float)',
-            'Large Bags': 'Nombre de grands sacs (float)',
-            'XLarge Bags': 'Nombre de très grands sacs (float)',
-            'year': 'Année (int)',
-            'type': 'Type d\'avocat : "conventional" ou "organic"',
-            'region': 'Région (ex: "LosAngeles", "NewYork", "Albany", etc.)'
+            col: definition['description']
+            for col, definition in list(FEATURES.items()) + list(FEATURES_OPTIONNELLES.items())
         },
+        'constraints': schema.decrire(),
         'example': {
             'Quality1': 5000,
             'Quality2': 10000,
@@ -122,42 +489,53 @@ def predict():
                 'status': 'error',
                 'message': 'Aucune donnée JSON reçue'
             }), 400
+
+        if not isinstance(data, dict):
+            return jsonify({
+                'status': 'error',
+                'message': 'Les données doivent être un objet JSON'
+            }), 400
         
-        # Liste des features requises
-        required_features = ['Quality1', 'Quality2', 'Quality3', 'Small Bags', 
-                           'Large Bags', 'XLarge Bags', 'year', 'type', 'region']
-        
-        # Vérification des features manquantes
-        missing_features = [f for f in required_features if f not in data]
-        if missing_features:
+        # Validation des features (présence, types, bornes, modalités)
+        brut = pd.DataFrame([data])
+        _, erreurs = schema.valider(brut)
+        if erreurs:
+            if drift_monitor is not None:
+                drift_monitor.enregistrer_rejets(brut)
             return jsonify({
                 'status': 'error',
-                'message': f'Features manquantes : {missing_features}'
+                'message': 'Entrée invalide : ' + ', '.join(e['message'] for e in erreurs[0]['errors']),
+                'errors': erreurs[0]['errors']
             }), 400
         
         # Création du DataFrame pour la prédiction
-        input_data = pd.DataFrame({
-            'Quality1': [float(data['Quality1'])],
-            'Quality2': [float(data['Quality2'])],
-            'Quality3': [float(data['Quality3'])],
-            'Small Bags': [float(data['Small Bags'])],
-            'Large Bags': [float(data['Large Bags'])],
-            'XLarge Bags': [float(data['XLarge Bags'])],
-            'year': [int(data['year'])],
-            'type': [str(data['type'])],
-            'region': [str(data['region'])]
-        })
+        debut = time.perf_counter()
+        input_data = preparer_entree(brut)
+        duree_preparation = time.perf_counter() - debut
+        if drift_monitor is not None:
+            drift_monitor.enregistrer(input_data)
         
         # Prédiction
-        prediction = model.predict(input_data)[0]
+        predictions, quantiles, duree_prediction = predire(input_data)
+        prediction = predictions[0]
+        if shadow_evaluator is not None:
+            # Même périmètre que le candidat : préparation et prédiction ponctuelle
+            shadow_evaluator.soumettre(brut, predictions, duree_preparation + duree_prediction)
+        prediction_id = uuid.uuid4().hex
+        journaliser([prediction_id], [data], predictions, quantiles)
         
-        return jsonify({
+        reponse = {
             'status': 'success',
+            'prediction_id': prediction_id,
             'prediction': round(float(prediction), 2),
             'unit': 'USD',
             'message': f'Prix prédit : {prediction:.2f} $',
             'input_data': data
-        })
+        }
+        if quantiles is not None:
+            reponse['interval'] = formater_intervalle(quantiles[0])
+        
+        return jsonify(reponse)
         
     except ValueError as e:
         return jsonify({
@@ -177,7 +555,8 @@ def predict_batch():
     """
     Route de prédiction par lot
     
-    Attend un JSON avec une liste d'objets contenant les features
+    Attend un JSON avec une liste d'objets contenant les features. Les lignes
+    invalides sont écartées et décrites dans "errors" ; les autres sont prédites
     """
     
     if model is None:
@@ -189,38 +568,61 @@ def predict_batch():
     try:
         data = request.get_json()
         
-        if not isinstance(data, list):
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
             return jsonify({
                 'status': 'error',
                 'message': 'Les données doivent être une liste d\'objets'
             }), 400
         
         predictions = []
-        
-        for i, item in enumerate(data):
-            input_data = pd.DataFrame({
-                'Quality1': [float(item['Quality1'])],
-                'Quality2': [float(item['Quality2'])],
-                'Quality3': [float(item['Quality3'])],
-                'Small Bags': [float(item['Small Bags'])],
-                'Large Bags': [float(item['Large Bags'])],
-                'XLarge Bags': [float(item['XLarge Bags'])],
-                'year': [int(item['year'])],
-                'type': [str(item['type'])],
-                'region': [str(item['region'])]
-            })
-            
-            pred = model.predict(input_data)[0]
-            predictions.append({
-                'index': i,
-                'prediction': round(float(pred), 2),
-                'input': item
-            })
+        erreurs = []
+
+        if data:
+            # Validation vectorisée de tout le lot, colonne par colonne
+            brut = pd.DataFrame(data)
+            valides, erreurs = schema.valider(brut)
+            if drift_monitor is not None and erreurs:
+                drift_monitor.enregistrer_rejets(brut[~valides])
+            if not valides.any():
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Aucune ligne valide dans le lot',
+                    'invalid_count': len(erreurs),
+                    'errors': erreurs
+                }), 400
+
+            # Prédiction vectorisée des lignes valides en un seul appel au modèle
+            brut = brut[valides]
+            positions = np.flatnonzero(valides)
+            items = [data[i] for i in positions]
+            debut = time.perf_counter()
+            input_data = preparer_entree(brut)
+            duree_preparation = time.perf_counter() - debut
+            if drift_monitor is not None:
+                drift_monitor.enregistrer(input_data)
+            preds, quantiles, duree_prediction = predire(input_data)
+            if shadow_evaluator is not None:
+                shadow_evaluator.soumettre(brut, preds, duree_preparation + duree_prediction)
+            identifiants = [uuid.uuid4().hex for _ in items]
+            journaliser(identifiants, items, preds, quantiles)
+
+            for k, (i, item, pred) in enumerate(zip(positions, items, preds)):
+                resultat = {
+                    'index': int(i),
+                    'prediction_id': identifiants[k],
+                    'prediction': round(float(pred), 2),
+                    'input': item
+                }
+                if quantiles is not None:
+                    resultat['interval'] = formater_intervalle(quantiles[k])
+                predictions.append(resultat)
         
         return jsonify({
             'status': 'success',
             'count': len(predictions),
-            'predictions': predictions
+            'invalid_count': len(erreurs),
+            'predictions': predictions,
+            'errors': erreurs
         })
         
     except Exception as e:
@@ -230,6 +632,215 @@ def predict_batch():
         }), 500
 
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Soumission d'un job de prédiction asynchrone
+
+    Accepte soit un fichier CSV uploadé (champ multipart "file"),
+    soit un JSON {"path": "..."} pointant vers un CSV présent sur le serveur.
+    Retourne l'identifiant du job à interroger via /jobs/<id>
+    """
+
+    if model is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Le modèle n\'est pas chargé.'
+        }), 500
+
+    try:
+        if 'file' in request.files:
+            job_id = job_manager.soumettre_fichier(request.files['file'])
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not isinstance(data.get('path'), str):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Fournir un fichier CSV (champ "file") ou un JSON {"path": ...}'
+                }), 400
+            job_id = job_manager.soumettre_chemin(data['path'])
+
+        return jsonify({
+            'status': 'success',
+            'job_id': job_id,
+            'queue': job_manager.profondeur_file()
+        }), 202
+
+    except (FileNotFoundError, PermissionError, ValueError) as e:
+        # ValueError : chemin invalide (ex. caractère nul)
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Liste des jobs et profondeur de la file d'attente"""
+    jobs = job_manager.lister()
+    return jsonify({
+        'status': 'success',
+        'queue': job_manager.profondeur_file(),
+        'count': len(jobs),
+        'jobs': jobs
+    })
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Statut, progression et débit d'un job"""
+    job = job_manager.statut(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Job inconnu : {job_id}'
+        }), 404
+    return jsonify({
+        'status': 'success',
+        'job': job
+    })
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Suppression d'un job terminé et de ses fichiers"""
+    if job_manager.statut(job_id) is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Job inconnu : {job_id}'
+        }), 404
+    if not job_manager.supprimer(job_id):
+        return jsonify({
+            'status': 'error',
+            'message': 'Job encore en cours'
+        }), 409
+    return jsonify({
+        'status': 'success',
+        'message': f'Job {job_id} supprimé'
+    })
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Téléchargement des résultats (CSV) d'un job terminé"""
+    job = job_manager.statut(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Job inconnu : {job_id}'
+        }), 404
+    if job['status'] != 'completed':
+        return jsonify({
+            'status': 'error',
+            'message': f'Le job n\'est pas terminé (statut : {job["status"]})',
+            'job': job
+        }), 409
+
+    def flux():
+        # Les morceaux sont concaténés à la volée sans tout charger en mémoire
+        for chemin in job_manager.fichiers_resultat(job_id):
+            with open(chemin, 'rb') as f:
+                while True:
+                    bloc = f.read(1 << 20)
+                    if not bloc:
+                        break
+                    yield bloc
+
+    return Response(
+        flux(),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=predictions_{job_id}.csv'}
+    )
+
+
+@app.route('/monitoring/drift', methods=['GET'])
+def drift_report():
+    """
+    Rapport de dérive des entrées reçues par /predict et /predict_batch
+
+    Retourne le dernier rapport calculé en arrière-plan, ou un rapport
+    recalculé immédiatement avec ?refresh=1
+    """
+    if drift_monitor is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Surveillance désactivée : drift_reference.json introuvable'
+        }), 404
+
+    if request.args.get('refresh') == '1' or drift_monitor.dernier_rapport is None:
+        drift_monitor.agreger()
+        rapport = drift_monitor.rapport()
+    else:
+        rapport = drift_monitor.dernier_rapport
+
+    return jsonify({
+        'status': 'success',
+        'drift': rapport
+    })
+
+
+@app.route('/monitoring/drift/reset', methods=['POST'])
+def drift_reset():
+    """Remet à zéro la fenêtre d'observation de la dérive"""
+    if drift_monitor is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Surveillance désactivée : drift_reference.json introuvable'
+        }), 404
+    drift_monitor.reinitialiser()
+    return jsonify({
+        'status': 'success',
+        'message': 'Fenêtre d\'observation réinitialisée'
+    })
+
+
+@app.route('/monitoring/prediction_log', methods=['GET'])
+def prediction_log_stats():
+    """État du journal des prédictions (file, enregistrements écrits et ignorés)"""
+    if prediction_logger is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Journal des prédictions désactivé (AVOCADO_PREDICTION_LOG_DIR vide)'
+        }), 404
+    return jsonify({
+        'status': 'success',
+        'prediction_log': prediction_logger.statistiques()
+    })
+
+
+@app.route('/shadow/stats', methods=['GET'])
+def shadow_stats():
+    """
+    Statistiques du modèle candidat évalué en ombre : écarts avec le modèle
+    principal (moyenne, moyenne absolue, RMSE, maximum, percentiles) et latences
+    """
+    if shadow_evaluator is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Aucun modèle candidat (AVOCADO_SHADOW_MODEL non défini ou introuvable)'
+        }), 404
+    return jsonify({
+        'status': 'success',
+        'model': SHADOW_MODEL_PATH,
+        'shadow': shadow_evaluator.statistiques()
+    })
+
+
+@app.route('/shadow/reset', methods=['POST'])
+def shadow_reset():
+    """Remet à zéro les statistiques du modèle candidat"""
+    if shadow_evaluator is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Aucun modèle candidat (AVOCADO_SHADOW_MODEL non défini ou introuvable)'
+        }), 404
+    shadow_evaluator.reinitialiser()
+    return jsonify({
+        'status': 'success',
+        'message': 'Statistiques du modèle candidat réinitialisées'
+    })
+
+
 # =============================================================================
 # LANCEMENT DU SERVEUR
 # =============================================================================
@@ -245,6 +856,12 @@ if __name__ == '__main__':
     print("   - GET  /features  : Liste des features")
     print("   - POST /predict   : Prédiction du prix")
     print("   - POST /predict_batch : Prédiction par lot")
+    print("   - POST /jobs      : Soumission d'un job asynchrone")
+    print("   - GET  /jobs/<id> : Statut d'un job")
+    print("   - GET  /jobs/<id>/result : Résultats d'un job")
+    print("   - GET  /monitoring/drift : Dérive des entrées")
+    print("   - GET  /monitoring/prediction_log : Journal des prédictions")
+    print("   - GET  /shadow/stats : Évaluation en ombre du modèle candidat")
     print("\n" + "=" * 60)
     
     # Lancement du serveur Flask
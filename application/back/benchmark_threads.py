@@ -0,0 +1,189 @@
+# ============================================================================
+# 🥑 BENCHMARK WORKERS × THREADS DE L'INFÉRENCE
+# ============================================================================
+# Mesure, pour chaque combinaison (nombre de workers, threads par worker), le
+# débit et la latence des prédictions 1 ligne (trafic /predict) et par lot
+# (trafic /predict_batch). Chaque worker est un processus séparé qui charge le
+# modèle comme le backend (plafonds OpenMP / BLAS, nthread du booster,
+# épinglage CPU optionnel), puis tous prédisent en même temps pendant une
+# durée fixe.
+#
+# Usage :
+#   python benchmark_threads.py --workers 1 2 4 --threads 1 2 -1 --duree 5
+#   python benchmark_threads.py --epingler --sortie benchmark_threads.json
+# (threads = -1 : tous les cœurs, comme le n_jobs=-1 de l'entraînement)
+# ============================================================================
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from cpu_config import nombre_threads, limiter_threads, epingler, configurer_modele
+
+DOSSIER_MODELE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model')
+
+# Taille des lots du trafic /predict_batch simulé
+TAILLE_LOT = 1000
+
+
+# =============================================================================
+# WORKER (PROCESSUS ENFANT)
+# =============================================================================
+
+def executer_worker(args):
+    """Charge le modèle, signale qu'il est prêt, puis prédit pendant `duree` secondes"""
+    limiter_threads(nombre_threads(args.threads))
+    epingler(args.cpus)
+
+    # Imports après les plafonds de threads
+    import numpy as np
+    sys.path.insert(0, DOSSIER_MODELE)
+    from distill_model import charger_features
+
+    if args.moteur == 'lite':
+        from lite_model import LiteModel
+        modele = LiteModel.load(os.path.join(DOSSIER_MODELE, 'avocado_price_model_lite.npz'))
+        colonnes = modele.colonnes_numeriques + modele.colonnes_categoriques
+    else:
+        import joblib
+        modele = joblib.load(os.path.join(DOSSIER_MODELE, 'avocado_price_model.pkl'))
+        colonnes = list(modele.named_steps['preprocessor'].feature_names_in_)
+        configurer_modele(modele, args.threads)
+
+    X = charger_features(os.path.join(DOSSIER_MODELE, 'avocado.csv'), colonnes)[colonnes]
+    if args.mode == 'single':
+        entrees = [X.iloc[[i]] for i in range(TAILLE_LOT)]
+    else:
+        entrees = [X.iloc[i:i + TAILLE_LOT] for i in range(0, 10 * TAILLE_LOT, TAILLE_LOT)]
+    for entree in entrees[:10]:
+        modele.predict(entree)
+
+    # Départ synchronisé : le parent répond quand tous les workers sont prêts
+    print('PRET', flush=True)
+    sys.stdin.readline()
+
+    latences = []
+    fin = time.perf_counter() + args.duree
+    i = 0
+    while time.perf_counter() < fin:
+        debut = time.perf_counter()
+        modele.predict(entrees[i % len(entrees)])
+        latences.append(time.perf_counter() - debut)
+        i += 1
+
+    print(json.dumps({
+        'lignes_par_appel': len(entrees[0]),
+        'latences_ms': np.round(np.array(latences) * 1000, 4).tolist()
+    }), flush=True)
+
+
+# =============================================================================
+# ORCHESTRATION (PROCESSUS PARENT)
+# =============================================================================
+
+def cpus_du_worker(index, threads, cpus_disponibles):
+    """Jeu de CPU du worker `index` : `threads` CPU consécutifs, en boucle"""
+    n = threads if threads > 0 else len(cpus_disponibles)
+    choisis = [cpus_disponibles[(index * n + k) % len(cpus_disponibles)] for k in range(n)]
+    return ','.join(str(c) for c in sorted(set(choisis)))
+
+
+def mesurer(workers, threads, mode, duree, moteur, epingle):
+    """Lance `workers` processus en parallèle et agrège débit et latences"""
+    import numpy as np
+
+    disponibles = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    processus = []
+    for i in range(workers):
+        commande = [sys.executable, os.path.abspath(__file__), '--worker', '--mode', mode,
+                    '--threads', str(threads), '--duree', str(duree), '--moteur', moteur]
+        if epingle:
+            commande += ['--cpus', cpus_du_worker(i, threads, disponibles)]
+        processus.append(subprocess.Popen(commande, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True))
+
+    for p in processus:
+        if p.stdout.readline().strip() != 'PRET':
+            raise RuntimeError('Un worker n\'a pas pu démarrer')
+    for p in processus:
+        p.stdin.write('\n')
+        p.stdin.flush()
+
+    resultats = [json.loads(p.communicate()[0]) for p in processus]
+    latences = np.concatenate([r['latences_ms'] for r in resultats])
+    appels = len(latences)
+    return {
+        'workers': workers,
+        'threads': threads,
+        'mode': mode,
+        'requests_per_s': appels / duree,
+        'rows_per_s': appels * resultats[0]['lignes_par_appel'] / duree,
+        'p50_ms': float(np.percentile(latences, 50)),
+        'p99_ms': float(np.percentile(latences, 99))
+    }
+
+
+def configuration(resultat):
+    threads = 'tous les' if resultat['threads'] <= 0 else resultat['threads']
+    return f"{resultat['workers']} worker(s) × {threads} thread(s)"
+
+
+def afficher(resultats):
+    print(f"\n{'mode':<8}{'workers':>8}{'threads':>8}{'req/s':>10}{'lignes/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    print("-" * 66)
+    for r in resultats:
+        threads = 'tous' if r['threads'] <= 0 else r['threads']
+        print(f"{r['mode']:<8}{r['workers']:>8}{threads:>8}{r['requests_per_s']:>10.0f}"
+              f"{r['rows_per_s']:>12.0f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+    for mode in ('single', 'batch'):
+        du_mode = [r for r in resultats if r['mode'] == mode]
+        if not du_mode:
+            continue
+        debit = max(du_mode, key=lambda r: r['rows_per_s'])
+        latence = min(du_mode, key=lambda r: r['p99_ms'])
+        print(f"\n🏆 {mode} : meilleur débit avec {configuration(debit)}, "
+              f"meilleure latence p99 avec {configuration(latence)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark workers × threads de l\'inférence')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, -1],
+                        help='Threads par worker (-1 : tous les cœurs)')
+    parser.add_argument('--modes', nargs='+', choices=['single', 'batch'], default=['single', 'batch'])
+    parser.add_argument('--duree', type=float, default=5.0, help='Durée de chaque mesure (s)')
+    parser.add_argument('--moteur', choices=['pipeline', 'lite'], default='pipeline')
+    parser.add_argument('--epingler', action='store_true', help='Épingle chaque worker sur ses propres CPU')
+    parser.add_argument('--sortie', help='Rapport JSON des mesures')
+    # Arguments internes des processus workers
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    parser.add_argument('--cpus', default='', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        args.threads = args.threads[0]
+        executer_worker(args)
+        sys.exit(0)
+
+    print("\n" + "=" * 60)
+    print("🧵 BENCHMARK WORKERS × THREADS")
+    print("=" * 60)
+    print(f"💻 CPU disponibles : {os.cpu_count()} | moteur : {args.moteur} | épinglage : {args.epingler}")
+
+    resultats = []
+    for mode in args.modes:
+        for workers in args.workers:
+            for threads in args.threads:
+                print(f"⏱️ {mode} : {workers} worker(s) × {threads} thread(s)...")
+                resultats.append(mesurer(workers, threads, mode, args.duree, args.moteur, args.epingler))
+
+    afficher(resultats)
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            json.dump({'cpu_count': os.cpu_count(), 'engine': args.moteur, 'pinned': args.epingler,
+                       'results': resultats}, f, indent=2)
+        print(f"\n💾 Rapport sauvegardé : {args.sortie}")
@@ -0,0 +1,73 @@
+# ============================================================================
+# 🥑 THREADS ET AFFINITÉ CPU À L'INFÉRENCE
+# ============================================================================
+# Le modèle est entraîné sur tous les cœurs (n_jobs=-1). À l'inférence,
+# plusieurs workers qui lancent chacun des threads OpenMP / BLAS sur tous les
+# cœurs se disputent le processeur et dégradent la latence de queue. Ce module :
+#   - plafonne les threads OpenMP / BLAS (à appeler AVANT d'importer numpy)
+#   - fixe le nombre de threads des boosters XGBoost chargés
+#   - épingle éventuellement le processus sur une liste de CPU
+# ============================================================================
+
+import os
+
+# Variables lues par les bibliothèques natives au chargement de numpy / xgboost
+VARIABLES_THREADS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                     'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def nombre_threads(n):
+    """Nombre de threads effectif : une valeur <= 0 signifie tous les cœurs"""
+    return n if n > 0 else (os.cpu_count() or 1)
+
+
+def limiter_threads(n):
+    """
+    Plafonne les threads OpenMP / BLAS à `n` pour ce processus. Sans effet sur
+    une bibliothèque déjà chargée : à appeler avant d'importer numpy, pandas ou
+    xgboost. Une variable déjà définie par l'opérateur est conservée.
+    """
+    for variable in VARIABLES_THREADS:
+        os.environ.setdefault(variable, str(n))
+
+
+def lire_cpus(spec):
+    """Liste de CPU au format "0-3,6" -> {0, 1, 2, 3, 6}"""
+    cpus = set()
+    for morceau in spec.split(','):
+        morceau = morceau.strip()
+        if not morceau:
+            continue
+        debut, _, fin = morceau.partition('-')
+        cpus.update(range(int(debut), int(fin or debut) + 1))
+    return cpus
+
+
+def epingler(spec):
+    """
+    Épingle le processus courant sur les CPU de `spec` ("0-3,6"). Retourne
+    l'ensemble appliqué, ou None si `spec` est vide ou si le système ne
+    permet pas de fixer l'affinité (Windows, macOS).
+    """
+    if not spec:
+        return None
+    if not hasattr(os, 'sched_setaffinity'):
+        print("⚠️ Affinité CPU non supportée sur ce système : AVOCADO_CPU_AFFINITY ignorée")
+        return None
+    cpus = lire_cpus(spec)
+    os.sched_setaffinity(0, cpus)
+    return cpus
+
+
+def configurer_modele(modele, n):
+    """
+    Fixe le nombre de threads d'un modèle chargé : XGBRegressor, pipeline
+    scikit-learn dont la dernière étape est un XGBRegressor, ou moteur léger
+    (NumPy, rien à faire). Remplace le n_jobs sauvegardé avec le modèle.
+    """
+    if modele is None:
+        return
+    estimateur = modele.steps[-1][1] if hasattr(modele, 'steps') else modele
+    if hasattr(estimateur, 'get_booster'):
+        # set_params propage n_jobs au booster déjà entraîné (paramètre nthread)
+        estimateur.set_params(n_jobs=n)
@@ -0,0 +1,264 @@
+# ============================================================================
+# 🥑 SURVEILLANCE DE LA DÉRIVE DES ENTRÉES (DRIFT)
+# ============================================================================
+# Résumés en mémoire constante du trafic reçu par /predict :
+#   - colonnes numériques : histogrammes sur les bornes (déciles) calculées à
+#     l'entraînement, plus les valeurs hors de la plage [min, max] d'entraînement
+#   - colonnes catégoriques : comptages, dont les modalités inconnues (y
+#     compris celles des lignes refusées par le schéma de validation)
+# Le chemin de prédiction ne fait qu'un dépôt non bloquant dans une file ; un
+# thread d'arrière-plan agrège les lots et compare périodiquement les
+# distributions aux statistiques de référence (PSI).
+# ============================================================================
+
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Seuils usuels du Population Stability Index
+SEUIL_PSI_ALERTE = 0.1
+SEUIL_PSI_DERIVE = 0.25
+
+# Part de valeurs hors de la plage d'entraînement déclenchant une alerte / une dérive
+SEUIL_HORS_PLAGE_ALERTE = 0.01
+SEUIL_HORS_PLAGE_DERIVE = 0.05
+
+# En dessous de ce nombre de lignes, le PSI est dominé par le bruit d'échantillonnage
+# (surtout pour "region" et ses 54 modalités) : le statut global n'est pas évalué
+MIN_LIGNES_COMPARAISON = 1000
+
+# Nombre maximal de modalités inconnues suivies individuellement par colonne
+MAX_INCONNUES_SUIVIES = 50
+
+EPSILON = 1e-6
+
+
+def psi(reference, courant):
+    """Population Stability Index entre deux distributions de proportions"""
+    reference = np.clip(np.asarray(reference, dtype=np.float64), EPSILON, None)
+    courant = np.clip(np.asarray(courant, dtype=np.float64), EPSILON, None)
+    return float(np.sum((courant - reference) * np.log(courant / reference)))
+
+
+def statut(valeur, seuil_alerte, seuil_derive):
+    if valeur is None:
+        return 'no_data'
+    if valeur >= seuil_derive:
+        return 'drift'
+    if valeur >= seuil_alerte:
+        return 'warning'
+    return 'ok'
+
+
+def pire_statut(statuts):
+    for niveau in ('drift', 'warning', 'ok'):
+        if niveau in statuts:
+            return niveau
+    return 'no_data'
+
+
+class DriftMonitor:
+    """
+    Moniteur de dérive des features d'entrée
+
+    - reference : statistiques sauvegardées à l'entraînement (drift_reference.json)
+    - periode : intervalle (s) entre deux agrégations / comparaisons
+    - taille_file : lots en attente au-delà desquels les nouveaux lots sont ignorés
+    """
+
+    def __init__(self, reference, periode=5.0, taille_file=1000):
+        self.reference = reference
+        self.bornes = {col: np.asarray(stats['edges'], dtype=np.float64)
+                       for col, stats in reference['numeric'].items()}
+        self.periode = periode
+        self._file = queue.Queue(maxsize=taille_file)
+        self._verrou = threading.Lock()
+        self._arret = threading.Event()
+        self._thread = None
+        self.dernier_rapport = None
+        self.reinitialiser()
+
+    @classmethod
+    def depuis_fichier(cls, chemin, **kwargs):
+        with open(chemin, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def reinitialiser(self):
+        """Remet les compteurs à zéro (nouvelle fenêtre d'observation)"""
+        with self._verrou:
+            self.n = 0
+            self.rejets = 0
+            self.lots_ignores = 0
+            self.debut = time.time()
+            self.numerique = {
+                col: {
+                    'bins': np.zeros(len(stats['edges']) + 1, dtype=np.int64),
+                    'below_min': 0,
+                    'above_max': 0,
+                    'missing': 0
+                }
+                for col, stats in self.reference['numeric'].items()
+            }
+            self.categoriel = {
+                col: {'counts': dict.fromkeys(stats['proportions'], 0), 'unknown': {}, 'unknown_total': 0}
+                for col, stats in self.reference['categorical'].items()
+            }
+
+    # -------------------------------------------------------------------------
+    # Chemin chaud : dépôt non bloquant
+    # -------------------------------------------------------------------------
+
+    def enregistrer(self, df):
+        """
+        Dépose un lot de lignes d'entrée (DataFrame) pour agrégation ultérieure.
+        Seule la référence au DataFrame est mise en file : aucune copie ni calcul
+        sur le chemin de prédiction. Le DataFrame ne doit plus être modifié.
+        """
+        self._deposer(df, True)
+
+    def enregistrer_rejets(self, df):
+        """
+        Dépose les lignes brutes refusées par le schéma de validation : seules
+        leurs colonnes catégoriques sont agrégées, pour que les modalités
+        inconnues (motif de rejet) restent visibles dans le rapport
+        """
+        self._deposer(df, False)
+
+    def _deposer(self, df, complet):
+        try:
+            self._file.put_nowait((df, complet))
+        except queue.Full:
+            self.lots_ignores += 1
+
+    # -------------------------------------------------------------------------
+    # Agrégation en arrière-plan
+    # -------------------------------------------------------------------------
+
+    def demarrer(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, name='drift-monitor', daemon=True)
+            self._thread.start()
+
+    def arreter(self):
+        self._arret.set()
+
+    def _boucle(self):
+        while not self._arret.wait(self.periode):
+            self.agreger()
+            self.dernier_rapport = self.rapport()
+
+    def agreger(self):
+        """Vide la file et met à jour les histogrammes et les comptages"""
+        while True:
+            try:
+                lot, complet = self._file.get_nowait()
+            except queue.Empty:
+                return
+            with self._verrou:
+                if complet:
+                    self._agreger_lot(lot)
+                else:
+                    self._agreger_categories(lot)
+                    self.rejets += len(lot)
+
+    def _agreger_lot(self, lot):
+        for col, compteurs in self.numerique.items():
+            stats = self.reference['numeric'][col]
+            valeurs = np.asarray(lot[col], dtype=np.float64)
+            manquantes = np.isnan(valeurs)
+            valeurs = valeurs[~manquantes]
+            compteurs['missing'] += int(manquantes.sum())
+            compteurs['below_min'] += int((valeurs < stats['min']).sum())
+            compteurs['above_max'] += int((valeurs > stats['max']).sum())
+            compteurs['bins'] += np.bincount(
+                np.searchsorted(self.bornes[col], valeurs, side='right'),
+                minlength=len(compteurs['bins'])
+            )
+
+        self._agreger_categories(lot)
+        self.n += len(lot)
+
+    def _agreger_categories(self, lot):
+        for col, compteurs in self.categoriel.items():
+            if col not in lot.columns:
+                continue
+            valeurs = lot[col].to_numpy()
+            valeurs = valeurs[~pd.isna(valeurs)]
+            if not len(valeurs):
+                continue
+            # Conversion élément par élément : une ligne refusée peut contenir une liste
+            modalites, effectifs = np.unique(np.array([str(v) for v in valeurs]), return_counts=True)
+            for modalite, effectif in zip(modalites, effectifs):
+                if modalite in compteurs['counts']:
+                    compteurs['counts'][modalite] += int(effectif)
+                    continue
+                compteurs['unknown_total'] += int(effectif)
+                inconnues = compteurs['unknown']
+                if modalite in inconnues or len(inconnues) < MAX_INCONNUES_SUIVIES:
+                    inconnues[modalite] = inconnues.get(modalite, 0) + int(effectif)
+
+    # -------------------------------------------------------------------------
+    # Comparaison à la référence
+    # -------------------------------------------------------------------------
+
+    def rapport(self):
+        """Compare les distributions observées à la référence"""
+        with self._verrou:
+            n = self.n
+            colonnes_num = {}
+            for col, compteurs in self.numerique.items():
+                stats = self.reference['numeric'][col]
+                observees = compteurs['bins'].sum()
+                valeur_psi = psi(stats['proportions'], compteurs['bins'] / observees) if observees else None
+                hors_plage = (compteurs['below_min'] + compteurs['above_max']) / n if n else None
+                colonnes_num[col] = {
+                    'psi': valeur_psi,
+                    'status': pire_statut([
+                        statut(valeur_psi, SEUIL_PSI_ALERTE, SEUIL_PSI_DERIVE),
+                        statut(hors_plage, SEUIL_HORS_PLAGE_ALERTE, SEUIL_HORS_PLAGE_DERIVE)
+                    ]),
+                    'out_of_range_rate': hors_plage,
+                    'below_min': compteurs['below_min'],
+                    'above_max': compteurs['above_max'],
+                    'missing': compteurs['missing']
+                }
+
+            colonnes_cat = {}
+            for col, compteurs in self.categoriel.items():
+                proportions_ref = self.reference['categorical'][col]['proportions']
+                modalites = list(proportions_ref)
+                connues = np.array([compteurs['counts'][m] for m in modalites], dtype=np.float64)
+                total = connues.sum() + compteurs['unknown_total']
+                if total:
+                    # Les inconnues forment une modalité supplémentaire absente de la référence
+                    courant = np.append(connues, compteurs['unknown_total']) / total
+                    reference = np.append([proportions_ref[m] for m in modalites], 0.0)
+                    valeur_psi = psi(reference, courant)
+                else:
+                    valeur_psi = None
+                colonnes_cat[col] = {
+                    'psi': valeur_psi,
+                    'status': statut(valeur_psi, SEUIL_PSI_ALERTE, SEUIL_PSI_DERIVE),
+                    'unknown_rate': compteurs['unknown_total'] / total if total else None,
+                    'unknown_values': dict(sorted(compteurs['unknown'].items(), key=lambda kv: -kv[1])[:10])
+                }
+
+            statuts = [c['status'] for c in list(colonnes_num.values()) + list(colonnes_cat.values())]
+            statut_global = pire_statut(statuts) if n >= MIN_LIGNES_COMPARAISON else 'insufficient_data'
+            return {
+                'rows_observed': n,
+                'rejected_rows': self.rejets,
+                'window_seconds': time.time() - self.debut,
+                'pending_batches': self._file.qsize(),
+                'dropped_batches': self.lots_ignores,
+                'reference_rows': self.reference.get('n'),
+                'status': statut_global,
+                'min_rows_for_status': MIN_LIGNES_COMPARAISON,
+                'numeric': colonnes_num,
+                'categorical': colonnes_cat,
+                'computed_at': time.time()
+            }
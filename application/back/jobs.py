@@ -0,0 +1,298 @@
+# ============================================================================
+# 🥑 JOBS DE PRÉDICTION PAR LOT - EXÉCUTION ASYNCHRONE
+# ============================================================================
+# Gestion des jobs de prédiction volumineux (plusieurs millions de lignes) :
+# les fichiers sont lus et écrits par morceaux sur le disque local par un
+# pool de workers en arrière-plan, et l'état des jobs est conservé dans une
+# table SQLite pour survivre à un redémarrage du backend.
+# ============================================================================
+
+import os
+import glob
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Colonnes du fichier avocado.csv d'origine renommées comme dans l'API
+RENOMMAGE = {
+    '4046': 'Quality1',
+    '4225': 'Quality2',
+    '4770': 'Quality3'
+}
+
+# Statuts possibles d'un job
+STATUT_EN_ATTENTE = 'queued'
+STATUT_EN_COURS = 'running'
+STATUT_TERMINE = 'completed'
+STATUT_ECHEC = 'failed'
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    rows_total INTEGER,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    chunks_done INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    processing_seconds REAL NOT NULL DEFAULT 0
+)
+"""
+
+
+class JobManager:
+    """
+    Gestionnaire de jobs de prédiction par lot
+
+    - predict_fn : fonction qui reçoit un DataFrame et retourne un DataFrame
+      de résultats (une ligne par ligne d'entrée)
+    - dossier : répertoire de travail (base SQLite + fichiers des jobs)
+    - max_workers : nombre de jobs exécutés en parallèle
+    - chunksize : nombre de lignes lues et prédites par morceau
+    """
+
+    def __init__(self, predict_fn, dossier, max_workers=2, chunksize=100_000, dossier_entrees=None):
+        self.predict_fn = predict_fn
+        self.dossier = dossier
+        # Seul répertoire dont les fichiers peuvent être soumis par chemin (None : désactivé)
+        self.dossier_entrees = os.path.realpath(dossier_entrees) if dossier_entrees else None
+        self.chunksize = chunksize
+        self.chemin_db = os.path.join(dossier, 'jobs.db')
+        self.max_workers = max_workers
+        self._verrou = threading.Lock()
+        self._executor = None
+
+        os.makedirs(dossier, exist_ok=True)
+        with self._connexion() as conn:
+            conn.execute(SCHEMA_SQL)
+
+    def demarrer(self):
+        """Démarre le pool de workers et reprend les jobs interrompus (idempotent)"""
+        with self._verrou:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._reprendre_jobs()
+
+    # -------------------------------------------------------------------------
+    # Accès à la base SQLite
+    # -------------------------------------------------------------------------
+
+    def _connexion(self):
+        """Ouvre une connexion SQLite (une par opération, partagée entre threads)"""
+        conn = sqlite3.connect(self.chemin_db, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _mettre_a_jour(self, job_id, **champs):
+        """Met à jour les champs d'un job"""
+        colonnes = ', '.join(f'{nom} = ?' for nom in champs)
+        with self._verrou, self._connexion() as conn:
+            conn.execute(f'UPDATE jobs SET {colonnes} WHERE id = ?', (*champs.values(), job_id))
+
+    def _lire(self, job_id):
+        with self._connexion() as conn:
+            ligne = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(ligne) if ligne else None
+
+    def _dossier_job(self, job_id):
+        return os.path.join(self.dossier, job_id)
+
+    # -------------------------------------------------------------------------
+    # API publique
+    # -------------------------------------------------------------------------
+
+    def soumettre_fichier(self, fichier):
+        """Soumet un fichier uploadé (werkzeug FileStorage) et retourne l'id du job"""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._dossier_job(job_id), exist_ok=True)
+        chemin = os.path.join(self._dossier_job(job_id), 'input.csv')
+        fichier.save(chemin)
+        return self._creer(job_id, chemin)
+
+    def soumettre_chemin(self, chemin):
+        """
+        Soumet un fichier CSV déjà présent sur le disque du serveur. Le chemin
+        (relatif au répertoire d'entrée ou absolu) doit, une fois les liens
+        symboliques résolus, se trouver dans le répertoire d'entrée configuré.
+        """
+        if self.dossier_entrees is None:
+            raise PermissionError('Soumission par chemin désactivée (AVOCADO_JOBS_INPUT_DIR non défini)')
+        reel = os.path.realpath(os.path.join(self.dossier_entrees, chemin))
+        if os.path.commonpath([reel, self.dossier_entrees]) != self.dossier_entrees:
+            raise PermissionError(f'Chemin hors du répertoire d\'entrée autorisé : {chemin}')
+        if not os.path.isfile(reel):
+            raise FileNotFoundError(f'Fichier introuvable : {chemin}')
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._dossier_job(job_id), exist_ok=True)
+        return self._creer(job_id, reel)
+
+    def _creer(self, job_id, chemin):
+        with self._verrou, self._connexion() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, input_path, created_at) VALUES (?, ?, ?, ?)',
+                (job_id, STATUT_EN_ATTENTE, chemin, time.time())
+            )
+        self.demarrer()
+        self._executor.submit(self._executer, job_id)
+        return job_id
+
+    def statut(self, job_id):
+        """Retourne l'état d'un job avec sa progression et son débit"""
+        job = self._lire(job_id)
+        if job is None:
+            return None
+        return self._formater(job)
+
+    def lister(self):
+        """Retourne tous les jobs, du plus récent au plus ancien"""
+        with self._connexion() as conn:
+            lignes = conn.execute('SELECT * FROM jobs ORDER BY created_at DESC').fetchall()
+        return [self._formater(dict(ligne)) for ligne in lignes]
+
+    def profondeur_file(self):
+        """Nombre de jobs en attente et en cours"""
+        with self._connexion() as conn:
+            lignes = conn.execute(
+                'SELECT status, COUNT(*) AS n FROM jobs WHERE status IN (?, ?) GROUP BY status',
+                (STATUT_EN_ATTENTE, STATUT_EN_COURS)
+            ).fetchall()
+        compte = {ligne['status']: ligne['n'] for ligne in lignes}
+        return {
+            'queued': compte.get(STATUT_EN_ATTENTE, 0),
+            'running': compte.get(STATUT_EN_COURS, 0)
+        }
+
+    def fichiers_resultat(self, job_id):
+        """Liste ordonnée des morceaux de résultat d'un job terminé"""
+        return sorted(glob.glob(os.path.join(self._dossier_job(job_id), 'part-*.csv')))
+
+    def _formater(self, job):
+        progression = None
+        if job['rows_total']:
+            progression = round(job['rows_done'] / job['rows_total'], 4)
+        debit = None
+        if job['processing_seconds'] > 0:
+            debit = round(job['rows_done'] / job['processing_seconds'], 1)
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'rows_total': job['rows_total'],
+            'rows_done': job['rows_done'],
+            'progress': progression,
+            'rows_per_second': debit,
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at']
+        }
+
+    # -------------------------------------------------------------------------
+    # Exécution des jobs
+    # -------------------------------------------------------------------------
+
+    def _reprendre_jobs(self):
+        """Remet en file les jobs interrompus par un arrêt du backend"""
+        with self._connexion() as conn:
+            lignes = conn.execute(
+                'SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at',
+                (STATUT_EN_ATTENTE, STATUT_EN_COURS)
+            ).fetchall()
+        for ligne in lignes:
+            self._executor.submit(self._executer, ligne['id'])
+
+    def _executer(self, job_id):
+        job = self._lire(job_id)
+        if job is None:
+            return
+
+        try:
+            rows_total = job['rows_total']
+            if rows_total is None:
+                rows_total = self._compter_lignes(job['input_path'])
+            self._mettre_a_jour(
+                job_id,
+                status=STATUT_EN_COURS,
+                rows_total=rows_total,
+                started_at=job['started_at'] or time.time()
+            )
+
+            # Reprise : les morceaux déjà écrits sont conservés et sautés
+            chunks_done = job['chunks_done']
+            rows_done = job['rows_done']
+            secondes = job['processing_seconds']
+            self._supprimer_morceaux_partiels(job_id, chunks_done)
+
+            lecteur = pd.read_csv(job['input_path'], chunksize=self.chunksize)
+            for numero, morceau in enumerate(lecteur):
+                if numero < chunks_done:
+                    continue
+
+                debut = time.time()
+                morceau = morceau.rename(columns=RENOMMAGE)
+                resultat = self.predict_fn(morceau)
+
+                chemin = os.path.join(self._dossier_job(job_id), f'part-{numero:06d}.csv')
+                resultat.to_csv(chemin + '.tmp', index=False, header=(numero == 0))
+                os.replace(chemin + '.tmp', chemin)
+
+                rows_done += len(morceau)
+                secondes += time.time() - debut
+                self._mettre_a_jour(
+                    job_id,
+                    rows_done=rows_done,
+                    chunks_done=numero + 1,
+                    processing_seconds=secondes
+                )
+
+            self._mettre_a_jour(job_id, status=STATUT_TERMINE, finished_at=time.time())
+
+        except Exception as e:
+            self._mettre_a_jour(
+                job_id,
+                status=STATUT_ECHEC,
+                error=str(e),
+                finished_at=time.time()
+            )
+
+    def _supprimer_morceaux_partiels(self, job_id, chunks_done):
+        """Supprime les morceaux écrits après le dernier point de reprise enregistré"""
+        for chemin in glob.glob(os.path.join(self._dossier_job(job_id), 'part-*')):
+            nom = os.path.basename(chemin)
+            numero = int(nom[len('part-'):len('part-') + 6])
+            if numero >= chunks_done or nom.endswith('.tmp'):
+                os.remove(chemin)
+
+    @staticmethod
+    def _compter_lignes(chemin):
+        """Compte les lignes de données (hors en-tête) en lisant le fichier par blocs"""
+        lignes = 0
+        dernier = b'\n'
+        with open(chemin, 'rb') as f:
+            while True:
+                bloc = f.read(1 << 20)
+                if not bloc:
+                    break
+                lignes += bloc.count(b'\n')
+                dernier = bloc[-1:]
+        if dernier != b'\n':
+            lignes += 1
+        return max(lignes - 1, 0)
+
+    def supprimer(self, job_id):
+        """Supprime un job terminé et ses fichiers"""
+        job = self._lire(job_id)
+        if job is None or job['status'] in (STATUT_EN_ATTENTE, STATUT_EN_COURS):
+            return False
+        with self._verrou, self._connexion() as conn:
+            conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        shutil.rmtree(self._dossier_job(job_id), ignore_errors=True)
+        return True
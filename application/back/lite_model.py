@@ -0,0 +1,121 @@
+# ============================================================================
+# 🥑 MOTEUR LÉGER - ÉVALUATION DU MODÈLE EN NUMPY PUR
+# ============================================================================
+# Évalue la version « aplatie » du pipeline (StandardScaler + OneHotEncoder +
+# arbres XGBoost) générée par model/distill_model.py. Seul NumPy est requis :
+# ni scikit-learn, ni xgboost, ni pandas au moment de la prédiction.
+# ============================================================================
+
+import numpy as np
+
+# Nombre de lignes évaluées à la fois (limite la mémoire des index (lignes × arbres))
+TAILLE_BLOC = 65536
+
+
+class LiteModel:
+    """
+    Modèle distillé : prétraitement + forêt d'arbres sous forme de tableaux NumPy
+
+    Les nœuds de tous les arbres sont concaténés dans des tableaux plats.
+    Les feuilles pointent sur elles-mêmes, ce qui permet de descendre tous les
+    arbres pour toutes les lignes en `max_depth` itérations vectorisées.
+    """
+
+    def __init__(self, tableaux):
+        self.colonnes_numeriques = [str(c) for c in tableaux['num_columns']]
+        self.moyennes = tableaux['num_mean'].astype(np.float64)
+        self.echelles = tableaux['num_scale'].astype(np.float64)
+
+        self.colonnes_categoriques = [str(c) for c in tableaux['cat_columns']]
+        self.categories = [tableaux[f'cat_{i}_categories'] for i in range(len(self.colonnes_categoriques))]
+
+        self.feature = tableaux['node_feature'].astype(np.int32)
+        self.seuil = tableaux['node_threshold'].astype(np.float32)
+        self.gauche = tableaux['node_left'].astype(np.int32)
+        self.droite = tableaux['node_right'].astype(np.int32)
+        self.defaut_gauche = tableaux['node_default_left'].astype(bool)
+        self.valeur = tableaux['node_value'].astype(np.float32)
+        self.racines = tableaux['tree_root'].astype(np.int32)
+        self.cible_arbre = tableaux['tree_target'].astype(np.int32)
+        self.base_score = tableaux['base_score'].astype(np.float64)
+        self.profondeur = int(tableaux['max_depth'])
+
+        self.n_features = len(self.colonnes_numeriques) + sum(len(c) for c in self.categories)
+        self.n_cibles = len(self.base_score)
+
+        # Enfants entrelacés : enfants[2 * nœud] = gauche, enfants[2 * nœud + 1] = droite,
+        # pour ne faire qu'une lecture par niveau de profondeur
+        self.enfants = np.empty(2 * len(self.gauche), dtype=np.int32)
+        self.enfants[0::2] = self.gauche
+        self.enfants[1::2] = self.droite
+
+    @classmethod
+    def load(cls, chemin):
+        """Charge un modèle distillé depuis un fichier .npz"""
+        with np.load(chemin, allow_pickle=False) as f:
+            return cls({cle: f[cle] for cle in f.files})
+
+    def transform(self, data):
+        """
+        Applique le prétraitement du pipeline d'origine
+
+        `data` peut être un DataFrame ou un dict de colonnes (listes ou tableaux)
+        """
+        colonnes = [
+            (np.asarray(data[col], dtype=np.float64) - moyenne) / echelle
+            for col, moyenne, echelle in zip(self.colonnes_numeriques, self.moyennes, self.echelles)
+        ]
+        n = len(colonnes[0]) if colonnes else len(data[self.colonnes_categoriques[0]])
+
+        X = np.zeros((n, self.n_features), dtype=np.float32)
+        for j, valeurs in enumerate(colonnes):
+            X[:, j] = valeurs
+
+        # One-hot : les catégories sont triées, une recherche dichotomique suffit.
+        # Les catégories inconnues donnent une ligne de zéros (handle_unknown='ignore')
+        decalage = len(colonnes)
+        lignes = np.arange(n)
+        for col, categories in zip(self.colonnes_categoriques, self.categories):
+            valeurs = np.asarray(data[col]).astype(str)
+            position = np.searchsorted(categories, valeurs)
+            position = np.minimum(position, len(categories) - 1)
+            connue = categories[position] == valeurs
+            X[lignes[connue], decalage + position[connue]] = 1.0
+            decalage += len(categories)
+
+        return X
+
+    def predict_matrix(self, X):
+        """Prédit à partir d'une matrice déjà prétraitée (n × n_features)"""
+        X = np.asarray(X, dtype=np.float32)
+        sorties = [self._predire_bloc(X[debut:debut + TAILLE_BLOC])
+                   for debut in range(0, len(X), TAILLE_BLOC)]
+        sortie = np.concatenate(sorties) if sorties else np.zeros((0, self.n_cibles))
+        return sortie[:, 0] if self.n_cibles == 1 else sortie
+
+    def predict(self, data):
+        """Prédit à partir des features brutes (même contrat que le pipeline)"""
+        return self.predict_matrix(self.transform(data))
+
+    def _predire_bloc(self, X):
+        n = len(X)
+        # Index plats dans X.ravel() : une seule lecture 1D par niveau
+        debut_ligne = (np.arange(n, dtype=np.int32) * self.n_features)[:, None]
+        x_plat = X.ravel()
+        a_des_nan = np.isnan(x_plat).any()
+        noeuds = np.broadcast_to(self.racines, (n, len(self.racines))).copy()
+
+        for _ in range(self.profondeur):
+            x = x_plat[debut_ligne + self.feature[noeuds]]
+            va_droite = x >= self.seuil[noeuds]
+            if a_des_nan:
+                va_droite = np.where(np.isnan(x), ~self.defaut_gauche[noeuds], va_droite)
+            noeuds = self.enfants[2 * noeuds + va_droite]
+
+        feuilles = self.valeur[noeuds].astype(np.float64)
+        if self.n_cibles == 1:
+            return self.base_score[0] + feuilles.sum(axis=1, keepdims=True)
+        sortie = np.empty((n, self.n_cibles), dtype=np.float64)
+        for k in range(self.n_cibles):
+            sortie[:, k] = self.base_score[k] + feuilles[:, self.cible_arbre == k].sum(axis=1)
+        return sortie
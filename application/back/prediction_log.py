@@ -0,0 +1,186 @@
+# ============================================================================
+# 🥑 JOURNAL DES PRÉDICTIONS - ÉCRITURE ASYNCHRONE PAR LOTS
+# ============================================================================
+# Chaque prédiction (entrées + sortie) est déposée dans une file bornée en
+# mémoire. Un thread d'arrière-plan la vide par lots et les ajoute à des
+# fichiers NDJSON compressés (gzip), avec rotation par taille. Si le disque
+# ne suit pas, la politique choisie s'applique :
+#   - "drop"  : les enregistrements sont ignorés (et comptés) sans attendre
+#   - "block" : la requête attend une place dans la file (au plus
+#               `timeout_blocage` secondes) avant d'ignorer l'enregistrement
+# Le journal est relu par model/replay_log.py pour le réentraînement.
+# ============================================================================
+
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+POLITIQUES = ('drop', 'block')
+
+
+class PredictionLogger:
+    """
+    Journal asynchrone des prédictions
+
+    - dossier : répertoire des fichiers predictions-*.ndjson.gz
+    - taille_file : nombre maximal de requêtes en attente d'écriture
+    - politique : "drop" ou "block" quand la file est pleine
+    - taille_lot : nombre d'enregistrements écrits par lot
+    - intervalle : délai maximal (s) avant l'écriture d'un lot incomplet
+    - taille_max_fichier : taille (octets) déclenchant la rotation du fichier
+    """
+
+    def __init__(self, dossier, taille_file=10000, politique='drop', taille_lot=1000,
+                 intervalle=1.0, taille_max_fichier=64 * 1024 * 1024, timeout_blocage=0.05):
+        if politique not in POLITIQUES:
+            raise ValueError(f'Politique inconnue : {politique} (attendu : {POLITIQUES})')
+        self.dossier = dossier
+        self.politique = politique
+        self.taille_lot = taille_lot
+        self.intervalle = intervalle
+        self.taille_max_fichier = taille_max_fichier
+        self.timeout_blocage = timeout_blocage
+
+        self._file = queue.Queue(maxsize=taille_file)
+        self._arret = threading.Event()
+        self._thread = None
+        self._fichier = None
+
+        self.ecrits = 0
+        self.ignores = 0
+        self.lots_ecrits = 0
+        self.erreurs_ecriture = 0
+        self.duree_ecriture = 0.0
+
+        os.makedirs(dossier, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # Chemin chaud
+    # -------------------------------------------------------------------------
+
+    def enregistrer(self, enregistrements):
+        """Dépose les enregistrements d'une requête (liste de dicts) ; ne bloque pas en mode "drop" """
+        try:
+            if self.politique == 'block':
+                self._file.put(enregistrements, timeout=self.timeout_blocage)
+            else:
+                self._file.put_nowait(enregistrements)
+        except queue.Full:
+            self.ignores += len(enregistrements)
+
+    # -------------------------------------------------------------------------
+    # Écriture en arrière-plan
+    # -------------------------------------------------------------------------
+
+    def demarrer(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, name='prediction-log', daemon=True)
+            self._thread.start()
+            atexit.register(self.arreter)
+
+    def arreter(self, timeout=5.0):
+        """Arrête le thread après avoir écrit les enregistrements en attente"""
+        self._arret.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _boucle(self):
+        lot = []
+        echeance = time.monotonic() + self.intervalle
+        while True:
+            attente = max(0.0, echeance - time.monotonic())
+            try:
+                lot.extend(self._file.get(timeout=attente))
+            except queue.Empty:
+                pass
+
+            arret = self._arret.is_set()
+            if len(lot) >= self.taille_lot or time.monotonic() >= echeance or arret:
+                if arret:
+                    # Vide la file avant de s'arrêter
+                    while True:
+                        try:
+                            lot.extend(self._file.get_nowait())
+                        except queue.Empty:
+                            break
+                if lot:
+                    self._ecrire(lot)
+                    lot = []
+                echeance = time.monotonic() + self.intervalle
+                if arret:
+                    return
+
+    def _chemin_courant(self):
+        if self._fichier is not None:
+            try:
+                plein = os.path.getsize(self._fichier) >= self.taille_max_fichier
+            except FileNotFoundError:
+                # Fichier courant archivé ou supprimé (ex. après un rejeu) : nouveau fichier
+                plein = True
+            if plein:
+                self._fichier = None
+        if self._fichier is None:
+            os.makedirs(self.dossier, exist_ok=True)
+            suffixe = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f')
+            self._fichier = os.path.join(self.dossier, f'predictions-{suffixe}.ndjson.gz')
+        return self._fichier
+
+    def _ecrire(self, lot):
+        debut = time.perf_counter()
+        donnees = ''.join(json.dumps(e, ensure_ascii=False, default=str) + '\n' for e in lot).encode('utf-8')
+        try:
+            # Chaque lot est un membre gzip ajouté au fichier (gzip multi-membres)
+            with open(self._chemin_courant(), 'ab') as f:
+                f.write(gzip.compress(donnees, compresslevel=6))
+            self.ecrits += len(lot)
+            self.lots_ecrits += 1
+        except OSError:
+            self.erreurs_ecriture += 1
+            self.ignores += len(lot)
+        self.duree_ecriture += time.perf_counter() - debut
+
+    # -------------------------------------------------------------------------
+    # Statistiques
+    # -------------------------------------------------------------------------
+
+    def statistiques(self):
+        fichiers = sorted(glob.glob(os.path.join(self.dossier, 'predictions-*.ndjson.gz')))
+        return {
+            'policy': self.politique,
+            'queued_requests': self._file.qsize(),
+            'queue_capacity': self._file.maxsize,
+            'records_written': self.ecrits,
+            'records_dropped': self.ignores,
+            'batches_written': self.lots_ecrits,
+            'write_errors': self.erreurs_ecriture,
+            'write_seconds': round(self.duree_ecriture, 3),
+            'files': len(fichiers),
+            'bytes_on_disk': sum(os.path.getsize(f) for f in fichiers),
+            'current_file': os.path.basename(self._fichier) if self._fichier else None
+        }
+
+
+def horodatage():
+    """Horodatage UTC ISO 8601 d'une requête"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def nouvel_enregistrement(identifiant, instant, entree, prediction, intervalle=None, moteur=None):
+    """Construit un enregistrement du journal pour une ligne prédite"""
+    enregistrement = {
+        'id': identifiant,
+        'timestamp': instant,
+        'input': entree,
+        'prediction': prediction
+    }
+    if intervalle is not None:
+        enregistrement['interval'] = intervalle
+    if moteur is not None:
+        enregistrement['engine'] = moteur
+    return enregistrement
@@ -0,0 +1,263 @@
+# ============================================================================
+# 🥑 SCHÉMA DES FEATURES - VALIDATION VECTORISÉE DES ENTRÉES
+# ============================================================================
+# Les définitions des features (type, bornes, description) sont compilées une
+# fois au démarrage en contrôles par colonne, complétés par les modalités
+# connues du modèle chargé. Un lot entier est validé colonne par colonne
+# (valeurs manquantes, non numériques, négatives, hors bornes, modalités
+# inconnues) et les erreurs sont renvoyées ligne par ligne : seules les lignes
+# valides sont transmises au modèle.
+# ============================================================================
+
+import datetime
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Borne de cohérence des volumes et des nombres de sacs (le plus gros volume
+# hebdomadaire du dataset, "TotalUS", est de l'ordre de 6e7)
+VOLUME_MAX = 1e9
+
+# Définitions des features requises, dans l'ordre attendu par le modèle
+FEATURES = {
+    'Quality1': {'type': 'float', 'min': 0.0, 'max': VOLUME_MAX,
+                 'description': 'Volume d\'avocats calibre 4046 (float)'},
+    'Quality2': {'type': 'float', 'min': 0.0, 'max': VOLUME_MAX,
+                 'description': 'Volume d\'avocats calibre 4225 (float)'},
+    'Quality3': {'type': 'float', 'min': 0.0, 'max': VOLUME_MAX,
+                 'description': 'Volume d\'avocats calibre 4770 (float)'},
+    'Small Bags': {'type': 'float', 'min': 0.0, 'max': VOLUME_MAX,
+                   'description': 'Nombre de petits sacs (float)'},
+    'Large Bags': {'type': 'float', 'min': 0.0, 'max': VOLUME_MAX,
+                   'description': 'Nombre de grands sacs (float)'},
+    'XLarge Bags': {'type': 'float', 'min': 0.0, 'max': VOLUME_MAX,
+                    'description': 'Nombre de très grands sacs (float)'},
+    'year': {'type': 'int', 'min': 2000, 'max': 2100,
+             'description': 'Année (int)'},
+    'type': {'type': 'category',
+             'description': 'Type d\'avocat : "conventional" ou "organic"'},
+    'region': {'type': 'category',
+               'description': 'Région (ex: "LosAngeles", "NewYork", "Albany", etc.)'}
+}
+
+# Dates représentables par pandas (datetime64[ns])
+DATE_MIN = np.datetime64('1678-01-01')
+DATE_MAX = np.datetime64('2262-01-01')
+
+# Features optionnelles : validées seulement si elles sont fournies
+FEATURES_OPTIONNELLES = {
+    'Date': {'type': 'date',
+             'description': 'Optionnel : date de la semaine prédite (AAAA-MM-JJ), utilisée par les features temporelles'}
+}
+
+
+class Schema:
+    """
+    Schéma compilé des features d'entrée
+
+    - definitions : features requises (voir FEATURES)
+    - categories : colonne -> modalités connues du modèle (pas de contrôle
+      d'appartenance pour une colonne absente)
+    - optionnelles : features validées uniquement si présentes
+    """
+
+    def __init__(self, definitions=FEATURES, categories=None, optionnelles=FEATURES_OPTIONNELLES):
+        self.definitions = definitions
+        self.optionnelles = optionnelles
+        self.categories = {
+            col: np.sort(np.asarray([str(m) for m in modalites]))
+            for col, modalites in (categories or {}).items()
+        }
+        self._controles = [
+            (col, self._compiler(col, definition), col in definitions)
+            for col, definition in list(definitions.items()) + list(optionnelles.items())
+        ]
+
+    def _compiler(self, col, definition):
+        """Retourne la fonction de contrôle d'une colonne : valeurs -> [(code, masque)]"""
+        if definition['type'] in ('float', 'int'):
+            return self._controle_numerique(definition)
+        if definition['type'] == 'category':
+            return self._controle_categorie(self.categories.get(col))
+        return self._controle_date
+
+    @staticmethod
+    def _controle_numerique(definition):
+        minimum, maximum = definition.get('min'), definition.get('max')
+        entier = definition['type'] == 'int'
+
+        def controler(valeurs):
+            manquantes = pd.isna(valeurs)
+            if valeurs.dtype.kind in 'iuf':
+                nombres = valeurs.astype(np.float64)
+                non_numeriques = np.zeros(len(valeurs), dtype=bool)
+            elif valeurs.dtype.kind == 'b':
+                nombres = np.full(len(valeurs), np.nan)
+                non_numeriques = ~manquantes
+            else:
+                # Chaînes numériques acceptées ("5000"), booléens refusés
+                nombres = pd.to_numeric(pd.Series(valeurs, dtype=object).where(
+                    [not isinstance(v, (bool, np.bool_)) for v in valeurs]), errors='coerce').to_numpy(dtype=np.float64)
+                non_numeriques = np.isnan(nombres) & ~manquantes
+            resultats = [('missing', manquantes), ('not_a_number', non_numeriques)]
+            with np.errstate(invalid='ignore'):
+                resultats.append(('not_finite', np.isinf(nombres)))
+                if minimum is not None:
+                    resultats.append(('negative' if minimum == 0 else 'below_min',
+                                      np.isfinite(nombres) & (nombres < minimum)))
+                if maximum is not None:
+                    resultats.append(('above_max', np.isfinite(nombres) & (nombres > maximum)))
+                if entier:
+                    resultats.append(('not_integer', np.isfinite(nombres) & (np.mod(nombres, 1) != 0)))
+            return resultats
+
+        return controler
+
+    @staticmethod
+    def _controle_categorie(modalites):
+        def controler(valeurs):
+            manquantes = pd.isna(valeurs)
+            resultats = [('missing', manquantes)]
+            if modalites is not None:
+                # Conversion élément par élément : une cellule peut contenir une liste
+                connues = np.isin(np.array([str(v) for v in valeurs], dtype=object), modalites)
+                resultats.append(('unknown_category', ~connues & ~manquantes))
+            return resultats
+
+        return controler
+
+    @staticmethod
+    def _controle_date(valeurs):
+        return [('invalid_date', np.isnat(lire_dates(valeurs)) & ~pd.isna(valeurs))]
+
+    # -------------------------------------------------------------------------
+    # Validation
+    # -------------------------------------------------------------------------
+
+    def valider(self, df):
+        """
+        Valide toutes les lignes de `df` colonne par colonne
+
+        Retourne (valides, erreurs) : masque booléen des lignes valides et liste
+        d'erreurs par ligne invalide, triée par position :
+        [{'index': 3, 'errors': [{'field': 'year', 'code': 'not_integer',
+          'message': ..., 'value': ...}]}]
+        """
+        n = len(df)
+        valides = np.ones(n, dtype=bool)
+        erreurs = {}
+
+        for col, controler, requise in self._controles:
+            if col not in df.columns:
+                if requise and n:
+                    valides[:] = False
+                    for i in range(n):
+                        erreurs.setdefault(i, []).append(self._erreur(col, 'missing', None))
+                continue
+
+            valeurs = df[col].to_numpy()
+            for code, masque in controler(valeurs):
+                if not masque.any():
+                    continue
+                valides &= ~masque
+                for i in np.flatnonzero(masque):
+                    erreurs.setdefault(int(i), []).append(self._erreur(col, code, valeurs[i]))
+
+        return valides, [{'index': i, 'errors': erreurs[i]} for i in sorted(erreurs)]
+
+    def _erreur(self, col, code, valeur):
+        definition = self.definitions.get(col) or self.optionnelles[col]
+        messages = {
+            'missing': 'valeur manquante',
+            'not_a_number': 'valeur non numérique',
+            'not_finite': 'valeur infinie',
+            'negative': 'valeur négative',
+            'below_min': f'valeur inférieure à {definition.get("min")}',
+            'above_max': f'valeur supérieure à {definition.get("max")}',
+            'not_integer': 'valeur non entière',
+            'unknown_category': 'modalité inconnue du modèle',
+            'invalid_date': 'date invalide (format attendu AAAA-MM-JJ)'
+        }
+        erreur = {'field': col, 'code': code, 'message': f'{col} : {messages[code]}'}
+        if valeur is not None and not (isinstance(valeur, float) and np.isnan(valeur)):
+            erreur['value'] = valeur.item() if isinstance(valeur, np.generic) else valeur
+        return erreur
+
+    # -------------------------------------------------------------------------
+    # Description (route /features)
+    # -------------------------------------------------------------------------
+
+    def decrire(self):
+        """Contraintes de chaque feature : type, bornes, modalités acceptées, caractère optionnel"""
+        description = {}
+        for col, definition in list(self.definitions.items()) + list(self.optionnelles.items()):
+            contraintes = {'type': definition['type'], 'required': col in self.definitions}
+            for cle in ('min', 'max'):
+                if cle in definition:
+                    contraintes[cle] = definition[cle]
+            if col in self.categories:
+                contraintes['categories'] = self.categories[col].tolist()
+            description[col] = contraintes
+        return description
+
+
+def lire_date(valeur):
+    """
+    Date naïve d'une valeur isolée (NaT si ce n'est pas une date). Seules les
+    chaînes et les dates sont acceptées : un nombre comme 20180101 serait lu
+    comme un horodatage depuis 1970. Une date avec fuseau horaire est
+    convertie en UTC, puis le fuseau est retiré.
+    """
+    if not isinstance(valeur, (str, datetime.date, np.datetime64)):
+        return np.datetime64('NaT')
+    try:
+        with warnings.catch_warnings():
+            # Formats non ISO ("04/01/2018") : pandas avertit qu'il devine le format
+            warnings.simplefilter('ignore', UserWarning)
+            date = pd.Timestamp(valeur)
+    except (ValueError, TypeError, OverflowError):
+        return np.datetime64('NaT')
+    if date is pd.NaT:
+        return np.datetime64('NaT')
+    if date.tzinfo is not None:
+        date = date.tz_convert('UTC').tz_localize(None)
+    date = date.to_datetime64()
+    return date if DATE_MIN <= date < DATE_MAX else np.datetime64('NaT')
+
+
+def lire_dates(valeurs):
+    """
+    Convertit chaque valeur indépendamment des autres lignes -> datetime64[ns]
+    (NaT si invalide). Les dates AAAA-MM-JJ sont converties d'un bloc par NumPy,
+    les autres formats valeur par valeur.
+    """
+    valeurs = np.asarray(valeurs)
+    if valeurs.dtype.kind == 'M':
+        return valeurs.astype('datetime64[ns]')
+    dates = np.full(len(valeurs), np.datetime64('NaT'), dtype='datetime64[ns]')
+    restantes = ~pd.isna(valeurs)
+
+    # Chemin rapide : les chaînes de la forme AAAA-MM-JJ
+    iso = np.array([
+        isinstance(v, str) and len(v) == 10 and v[4] == '-' and v[7] == '-' for v in valeurs
+    ], dtype=bool) & restantes
+    if iso.any():
+        try:
+            jours = np.asarray(valeurs[iso], dtype='datetime64[D]')
+        except ValueError:
+            jours = None
+        if jours is not None:
+            representables = (jours >= DATE_MIN) & (jours < DATE_MAX)
+            positions = np.flatnonzero(iso)[representables]
+            dates[positions] = jours[representables]
+            restantes[positions] = False
+
+    for i in np.flatnonzero(restantes):
+        dates[i] = lire_date(valeurs[i])
+    return dates
+
+
+def resumer_erreurs(erreurs_ligne):
+    """Résumé texte des erreurs d'une ligne ("year:not_integer;region:unknown_category")"""
+    return ';'.join(f"{e['field']}:{e['code']}" for e in erreurs_ligne)
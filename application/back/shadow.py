@@ -0,0 +1,151 @@
+# ============================================================================
+# 🥑 ÉVALUATION EN OMBRE (SHADOW) D'UN MODÈLE CANDIDAT
+# ============================================================================
+# Une fraction des requêtes /predict et /predict_batch est rejouée sur un
+# modèle candidat (ex. un avocado_price_model.pkl réentraîné) avant sa mise
+# en production. La requête ne fait que déposer ses entrées brutes et les
+# prédictions du modèle principal dans une file bornée ; un thread
+# d'arrière-plan prépare les entrées du candidat, le fait prédire et
+# enregistre les écarts et sa latence. Les clients ne reçoivent que la
+# réponse du modèle principal.
+# ============================================================================
+
+import collections
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+# Quantiles reportés pour les écarts absolus et les latences
+PERCENTILES = (50, 95, 99)
+
+
+def resume(valeurs, unite=1.0):
+    """Percentiles d'une fenêtre de valeurs (None si vide)"""
+    if not valeurs:
+        return None
+    p = np.percentile(np.fromiter(valeurs, dtype=np.float64), PERCENTILES) * unite
+    return {f'p{q}': float(v) for q, v in zip(PERCENTILES, p)}
+
+
+class ShadowEvaluator:
+    """
+    Évaluation d'un modèle candidat sur le trafic réel
+
+    - candidat : modèle exposant predict(DataFrame)
+    - preparer : fonction DataFrame brut -> DataFrame d'entrée du candidat
+    - fraction : part des requêtes rejouées (tirage par requête)
+    - taille_file : requêtes en attente au-delà desquelles les nouvelles sont ignorées
+    - taille_fenetre : nombre de valeurs conservées pour les percentiles
+    """
+
+    def __init__(self, candidat, preparer, fraction=0.1, taille_file=1000, taille_fenetre=10000):
+        self.candidat = candidat
+        self.preparer = preparer
+        self.fraction = fraction
+        self.taille_fenetre = taille_fenetre
+        self._file = queue.Queue(maxsize=taille_file)
+        self._verrou = threading.Lock()
+        self._thread = None
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        """Remet les statistiques à zéro"""
+        with self._verrou:
+            self.debut = time.time()
+            self.requetes = 0
+            self.lignes = 0
+            self.ignorees = 0
+            self.erreurs = 0
+            self.derniere_erreur = None
+            self.somme_ecarts = 0.0
+            self.somme_ecarts_abs = 0.0
+            self.somme_ecarts_carres = 0.0
+            self.ecart_abs_max = 0.0
+            self.ecarts_abs = collections.deque(maxlen=self.taille_fenetre)
+            self.latences_candidat = collections.deque(maxlen=self.taille_fenetre)
+            self.latences_principal = collections.deque(maxlen=self.taille_fenetre)
+
+    # -------------------------------------------------------------------------
+    # Chemin chaud : tirage et dépôt non bloquant
+    # -------------------------------------------------------------------------
+
+    def soumettre(self, brut, predictions, duree_principal):
+        """
+        Dépose une requête tirée au sort : entrées brutes (DataFrame, non copié),
+        prédictions et durée (s) du modèle principal
+        """
+        if random.random() >= self.fraction:
+            return
+        try:
+            self._file.put_nowait((brut, predictions, duree_principal))
+        except queue.Full:
+            self.ignorees += 1
+
+    # -------------------------------------------------------------------------
+    # Prédiction du candidat en arrière-plan
+    # -------------------------------------------------------------------------
+
+    def demarrer(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, name='shadow-model', daemon=True)
+            self._thread.start()
+
+    def _boucle(self):
+        while True:
+            self.traiter(*self._file.get())
+
+    def traiter(self, brut, predictions, duree_principal):
+        try:
+            debut = time.perf_counter()
+            predictions_candidat = self.candidat.predict(self.preparer(brut))
+            duree = time.perf_counter() - debut
+        except Exception as e:
+            with self._verrou:
+                self.erreurs += 1
+                self.derniere_erreur = str(e)
+            return
+
+        ecarts = np.asarray(predictions_candidat, dtype=np.float64) - np.asarray(predictions, dtype=np.float64)
+        ecarts_abs = np.abs(ecarts)
+        with self._verrou:
+            self.requetes += 1
+            self.lignes += len(ecarts)
+            self.somme_ecarts += float(ecarts.sum())
+            self.somme_ecarts_abs += float(ecarts_abs.sum())
+            self.somme_ecarts_carres += float((ecarts ** 2).sum())
+            self.ecart_abs_max = max(self.ecart_abs_max, float(ecarts_abs.max()))
+            self.ecarts_abs.extend(ecarts_abs[-self.taille_fenetre:].tolist())
+            self.latences_candidat.append(duree)
+            self.latences_principal.append(duree_principal)
+
+    # -------------------------------------------------------------------------
+    # Statistiques agrégées
+    # -------------------------------------------------------------------------
+
+    def statistiques(self):
+        with self._verrou:
+            n = self.lignes
+            return {
+                'fraction': self.fraction,
+                'window_seconds': time.time() - self.debut,
+                'requests_scored': self.requetes,
+                'rows_scored': n,
+                'pending_requests': self._file.qsize(),
+                'dropped_requests': self.ignorees,
+                'errors': self.erreurs,
+                'last_error': self.derniere_erreur,
+                'delta': {
+                    'mean': self.somme_ecarts / n if n else None,
+                    'mean_abs': self.somme_ecarts_abs / n if n else None,
+                    'rmse': float(np.sqrt(self.somme_ecarts_carres / n)) if n else None,
+                    'max_abs': self.ecart_abs_max if n else None,
+                    'abs_percentiles': resume(self.ecarts_abs)
+                },
+                'latency_ms': {
+                    'candidate': resume(self.latences_candidat, 1000),
+                    'primary': resume(self.latences_principal, 1000)
+                }
+            }
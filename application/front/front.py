@@ -264,6 +264,11 @@ if st.button("🔮 Prédire le prix", use_container_width=True):
                 </div>
                 """, unsafe_allow_html=True)
                 
+                # Intervalle de prédiction (si le backend a un modèle de quantiles)
+                interval = result.get("interval")
+                if interval:
+                    st.info(f"📐 Intervalle probable (p10 – p90) : {interval['p10']:.2f} $ – {interval['p90']:.2f} $")
+                
                 # Détails de la prédiction
                 with st.expander("📋 Détails de la requête"):
                     st.json(data)
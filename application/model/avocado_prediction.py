@@ -10,22 +10,29 @@
 # =============================================================================
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import time
 import os
+import json
 import joblib
 
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.metrics import mean_squared_error, r2_score
 from xgboost import XGBRegressor
 
+from feature_store import ajouter_features_temporelles, FeatureStore, FEATURES_TEMPORELLES
+from evaluation import evaluer, evaluer_quantiles, sauvegarder_rapport, lancer_graphiques
+
+# Ajout des features temporelles (semaine, prix décalés, moyennes glissantes)
+UTILISER_FEATURES_TEMPORELLES = True
+
+# Entraînement d'un modèle de quantiles (p10 / p50 / p90) pour les intervalles de prédiction
+ENTRAINER_QUANTILES = True
+QUANTILES = [0.1, 0.5, 0.9]
+
 # Configuration de l'affichage
 pd.set_option('display.max_columns', None)
-plt.style.use('seaborn-v0_8-whitegrid')
 
 print("✅ Bibliothèques importées avec succès !")
 
@@ -38,6 +45,15 @@ print("=" * 60)
 
 # 1.1 Charger les données
 df = pd.read_csv('avocado.csv')
+
+# Données supplémentaires au même format (ex. journal des prédictions rejoué par
+# replay_log.py), séparées par os.pathsep dans AVOCADO_EXTRA_DATA
+donnees_supplementaires = [c for c in os.environ.get('AVOCADO_EXTRA_DATA', '').split(os.pathsep) if c]
+if donnees_supplementaires:
+    df = pd.concat([df] + [pd.read_csv(c) for c in donnees_supplementaires], ignore_index=True)
+    # Une semaine déjà présente pour une série est remplacée par la donnée la plus récente
+    df = df.drop_duplicates(['Date', 'region', 'type'], keep='last')
+    print(f"\n➕ Données supplémentaires ajoutées : {donnees_supplementaires}")
 print(f"\n📊 Dimensions du dataset : {df.shape[0]} lignes × {df.shape[1]} colonnes")
 print("\n📋 Aperçu des 5 premières lignes :")
 print(df.head())
@@ -107,7 +123,13 @@ print("\n" + "=" * 60)
 print("🔧 ÉTAPE 2 : PRÉPARER LES DONNÉES POUR LE MODÈLE")
 print("=" * 60)
 
-# 2.1 Définition des features (X) et de la cible (y)
+# 2.1 Features temporelles par série (region, type)
+if UTILISER_FEATURES_TEMPORELLES:
+    df = ajouter_features_temporelles(df)
+    print(f"\n📅 Features temporelles ajoutées : {FEATURES_TEMPORELLES}")
+    print("   (calculées uniquement à partir des semaines précédentes de chaque série)")
+
+# 2.2 Définition des features (X) et de la cible (y)
 X = df.drop(columns=['AveragePrice', 'Date'])
 y = df['AveragePrice']
 
@@ -115,14 +137,16 @@ print(f"\n🎯 Variable cible (y) : AveragePrice")
 print(f"📊 Dimensions de X : {X.shape}")
 print(f"📊 Dimensions de y : {y.shape}")
 
-# 2.2 Définition des colonnes numériques et catégoriques
+# 2.3 Définition des colonnes numériques et catégoriques
 colonnes_numeriques = ['Quality1', 'Quality2', 'Quality3', 'Small Bags', 'Large Bags', 'XLarge Bags', 'year']
+if UTILISER_FEATURES_TEMPORELLES:
+    colonnes_numeriques += FEATURES_TEMPORELLES
 colonnes_categoriques = ['type', 'region']
 
 print(f"\n🔢 Colonnes numériques ({len(colonnes_numeriques)}) : {colonnes_numeriques}")
 print(f"🏷️ Colonnes catégoriques ({len(colonnes_categoriques)}) : {colonnes_categoriques}")
 
-# 2.3 Création du ColumnTransformer
+# 2.4 Création du ColumnTransformer
 preprocessor = ColumnTransformer(
     transformers=[
         ('num', StandardScaler(), colonnes_numeriques),
@@ -135,7 +159,7 @@ print("\n✅ ColumnTransformer créé avec succès !")
 print("   - Colonnes numériques → StandardScaler")
 print("   - Colonnes catégoriques → OneHotEncoder")
 
-# 2.4 Division des données
+# 2.5 Division des données
 X_train, X_test, y_train, y_test = train_test_split(
     X, y,
     test_size=0.2,
@@ -188,6 +212,26 @@ training_time = time.time() - start_time
 print(f"✅ Modèle entraîné avec succès !")
 print(f"⏱️ Temps d'entraînement : {training_time:.2f} secondes")
 
+# 3.4 Modèle de quantiles (intervalles de prédiction)
+# Un seul booster multi-quantiles, entraîné sur la sortie du préprocesseur déjà
+# ajusté : au moment de la prédiction, la matrice prétraitée est partagée
+if ENTRAINER_QUANTILES:
+    print(f"\n🚀 Entraînement du modèle de quantiles {QUANTILES}...")
+    start_time = time.time()
+
+    quantile_model = XGBRegressor(
+        objective='reg:quantileerror',
+        quantile_alpha=np.array(QUANTILES),
+        n_estimators=100,
+        max_depth=6,
+        learning_rate=0.1,
+        random_state=42,
+        n_jobs=-1
+    )
+    quantile_model.fit(pipeline.named_steps['preprocessor'].transform(X_train), y_train)
+
+    print(f"✅ Modèle de quantiles entraîné en {time.time() - start_time:.2f} secondes")
+
 # =============================================================================
 # ÉTAPE 4 : ÉVALUATION ET SAUVEGARDE DU MODÈLE
 # =============================================================================
@@ -195,18 +239,17 @@ print("\n" + "=" * 60)
 print("📈 ÉTAPE 4 : ÉVALUATION ET SAUVEGARDE DU MODÈLE")
 print("=" * 60)
 
-# 4.1 Prédictions
-y_pred = pipeline.predict(X_test)
-y_train_pred = pipeline.predict(X_train)
+# 4.1 Prédictions et métriques (train + test prédits en un seul appel)
+rapport, y_train_pred, y_pred = evaluer(pipeline, X_train, y_train, X_test, y_test)
 
 print("\n✅ Prédictions effectuées !")
 
 # 4.2 Calcul des métriques
-rmse_train = np.sqrt(mean_squared_error(y_train, y_train_pred))
-r2_train = r2_score(y_train, y_train_pred)
+rmse_train = rapport['train']['rmse']
+r2_train = rapport['train']['r2']
 
-rmse_test = np.sqrt(mean_squared_error(y_test, y_pred))
-r2_test = r2_score(y_test, y_pred)
+rmse_test = rapport['test']['rmse']
+r2_test = rapport['test']['r2']
 
 print("\n" + "-" * 50)
 print("📊 PERFORMANCES DU MODÈLE")
@@ -239,40 +282,49 @@ comparaison = pd.DataFrame({
 })
 print(comparaison.to_string(index=False))
 
-# 4.4 Visualisations
-print("\n📊 Génération des graphiques...")
-
-fig, axes = plt.subplots(1, 2, figsize=(14, 5))
-
-# Graphique 1 : Scatter plot
-ax1 = axes[0]
-ax1.scatter(y_test, y_pred, alpha=0.5, edgecolors='k', linewidth=0.5)
-y_min, y_max = float(np.min(y_test)), float(np.max(y_test))
-ax1.plot([y_min, y_max], [y_min, y_max], 'r--', lw=2, label='Prédiction parfaite')
-ax1.set_xlabel('Prix Réel ($)', fontsize=12)
-ax1.set_ylabel('Prix Prédit ($)', fontsize=12)
-ax1.set_title(f'Prédictions vs Valeurs Réelles\nR² = {r2_test:.4f}', fontsize=14)
-ax1.legend()
-ax1.grid(True, alpha=0.3)
-
-# Graphique 2 : Distribution des erreurs
-ax2 = axes[1]
-erreurs = y_test - y_pred
-ax2.hist(erreurs, bins=50, edgecolor='black', alpha=0.7, color='steelblue')
-ax2.axvline(x=0, color='red', linestyle='--', linewidth=2, label='Erreur = 0')
-ax2.set_xlabel('Erreur de prédiction ($)', fontsize=12)
-ax2.set_ylabel('Fréquence', fontsize=12)
-ax2.set_title(f'Distribution des Erreurs\nRMSE = {rmse_test:.4f} $', fontsize=14)
-ax2.legend()
-ax2.grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.savefig('model_evaluation.png', dpi=150, bbox_inches='tight')
-plt.show()
-
-print("✅ Graphiques sauvegardés : model_evaluation.png")
+# 4.4 Rapport d'évaluation et visualisations
+print("\n📊 Métriques de test par type :")
+for type_avocat, metriques in rapport['test_by_type'].items():
+    print(f"   - {type_avocat:<13} RMSE : {metriques['rmse']:.4f} $ | R² : {metriques['r2']:.4f}")
+
+regions_triees = sorted(rapport['test_by_region'].items(), key=lambda item: item[1]['rmse'])
+print("\n🌍 Régions les mieux / moins bien prédites (RMSE test) :")
+for region, metriques in regions_triees[:3] + regions_triees[-3:]:
+    print(f"   - {region:<20} {metriques['rmse']:.4f} $")
+
+quantiles = rapport['residual_quantiles']
+print(f"\n📏 Résidus (test) : p05 = {quantiles['p05']:.3f} $ | p50 = {quantiles['p50']:.3f} $ | p95 = {quantiles['p95']:.3f} $")
+
+print("\n🏆 Features les plus importantes :")
+for nom, importance in list(rapport['feature_importances'].items())[:5]:
+    print(f"   - {nom:<30} {importance:.4f}")
+
+if ENTRAINER_QUANTILES:
+    rapport['intervals'] = evaluer_quantiles(pipeline, quantile_model, QUANTILES, X_test, y_test)
+    intervalles = rapport['intervals']
+    print(f"\n📐 Intervalles p{round(QUANTILES[0] * 100)}-p{round(QUANTILES[-1] * 100)} (test) :")
+    print(f"   - Couverture : {intervalles['coverage'] * 100:.1f}% (attendue : {intervalles['expected_coverage'] * 100:.0f}%)")
+    print(f"   - Largeur moyenne : {intervalles['mean_width']:.3f} $")
+    for nom, mesure in intervalles['latency'].items():
+        print(f"   - Latence {nom} : {mesure['point_ms']:.2f} ms → {mesure['with_intervals_ms']:.2f} ms "
+              f"(+{mesure['extra_ms']:.2f} ms)")
+
+nom_rapport = 'evaluation_report.json'
+sauvegarder_rapport(rapport, nom_rapport)
+print(f"\n💾 Rapport d'évaluation sauvegardé : {nom_rapport}")
+
+# Les graphiques sont générés en arrière-plan (backend non interactif Agg)
+print("\n📊 Génération des graphiques en arrière-plan...")
+processus_graphiques = lancer_graphiques(y_test, y_pred, rapport, 'model_evaluation.png')
 
 # 4.5 Sauvegarde du modèle
+# n_jobs est sauvegardé avec le modèle : tous les cœurs servent à l'entraînement,
+# mais à l'inférence chaque worker du backend doit se limiter à ses propres
+# threads (AVOCADO_NTHREAD), sinon plusieurs workers se disputent tous les cœurs
+pipeline.named_steps['regressor'].set_params(n_jobs=1)
+if ENTRAINER_QUANTILES:
+    quantile_model.set_params(n_jobs=1)
+
 nom_fichier = 'avocado_price_model.pkl'
 joblib.dump(pipeline, nom_fichier)
 
@@ -285,6 +337,42 @@ print(f"✅ Pipeline sauvegardé avec succès !")
 print(f"📁 Fichier : {nom_fichier}")
 print(f"📦 Taille : {taille_fichier:.2f} MB")
 
+# Modèle de quantiles : utilisé par le backend pour renvoyer des intervalles
+nom_quantiles = 'avocado_quantile_model.pkl'
+if ENTRAINER_QUANTILES:
+    joblib.dump(quantile_model, nom_quantiles)
+    print(f"✅ Modèle de quantiles sauvegardé : {nom_quantiles}")
+
+# Statistiques de référence des entrées brutes, comparées par le backend au
+# trafic reçu pour détecter une dérive (bornes des déciles, proportions, plage)
+nom_reference = 'drift_reference.json'
+reference = {'n': len(X_train), 'numeric': {}, 'categorical': {}}
+for col in ['Quality1', 'Quality2', 'Quality3', 'Small Bags', 'Large Bags', 'XLarge Bags', 'year']:
+    valeurs = X_train[col].to_numpy(dtype=float)
+    bornes = np.unique(np.quantile(valeurs, np.linspace(0.1, 0.9, 9)))
+    effectifs = np.bincount(np.searchsorted(bornes, valeurs, side='right'), minlength=len(bornes) + 1)
+    reference['numeric'][col] = {
+        'edges': bornes.tolist(),
+        'proportions': (effectifs / len(valeurs)).tolist(),
+        'min': float(valeurs.min()),
+        'max': float(valeurs.max())
+    }
+for col in colonnes_categoriques:
+    reference['categorical'][col] = {
+        'proportions': X_train[col].value_counts(normalize=True).to_dict()
+    }
+with open(nom_reference, 'w', encoding='utf-8') as f:
+    json.dump(reference, f, indent=2)
+print(f"✅ Statistiques de référence sauvegardées : {nom_reference}")
+
+# Feature store : fin d'historique de chaque série, utilisée par le backend
+# pour retrouver les features temporelles d'une requête
+nom_feature_store = 'avocado_feature_store.pkl'
+if UTILISER_FEATURES_TEMPORELLES:
+    feature_store = FeatureStore.depuis_dataframe(df)
+    feature_store.sauvegarder(nom_feature_store)
+    print(f"✅ Feature store sauvegardé : {nom_feature_store} ({len(feature_store.features)} séries)")
+
 # 4.6 Vérification du chargement
 pipeline_charge = joblib.load(nom_fichier)
 y_pred_verif = pipeline_charge.predict(X_test.head(5))
@@ -292,6 +380,12 @@ y_pred_verif = pipeline_charge.predict(X_test.head(5))
 if np.allclose(y_pred[:5], y_pred_verif):
     print("✅ Vérification : Le modèle se charge et fonctionne correctement !")
 
+# 4.7 Fin du rendu des graphiques
+if processus_graphiques.wait() == 0:
+    print("✅ Graphiques sauvegardés : model_evaluation.png, feature_importance.png")
+else:
+    print("⚠️ Échec de la génération des graphiques")
+
 # =============================================================================
 # RÉSUMÉ FINAL
 # =============================================================================
@@ -309,6 +403,8 @@ print(f"   - Test : {len(X_test)} échantillons (20%)")
 print(f"\n🔧 PRÉTRAITEMENT :")
 print(f"   - StandardScaler sur {len(colonnes_numeriques)} colonnes numériques")
 print(f"   - OneHotEncoder sur {len(colonnes_categoriques)} colonnes catégoriques")
+if UTILISER_FEATURES_TEMPORELLES:
+    print(f"   - Features temporelles : {len(FEATURES_TEMPORELLES)} colonnes")
 
 print(f"\n🤖 MODÈLE : XGBRegressor")
 print(f"   - n_estimators : 100")
@@ -321,7 +417,13 @@ print(f"   - R²   : {r2_test:.4f} ({r2_test*100:.2f}%)")
 
 print(f"\n💾 FICHIERS GÉNÉRÉS :")
 print(f"   - {nom_fichier} (modèle)")
-print(f"   - model_evaluation.png (graphiques)")
+if ENTRAINER_QUANTILES:
+    print(f"   - {nom_quantiles} (modèle de quantiles)")
+print(f"   - {nom_reference} (référence pour la détection de dérive)")
+if UTILISER_FEATURES_TEMPORELLES:
+    print(f"   - {nom_feature_store} (feature store)")
+print(f"   - {nom_rapport} (rapport d'évaluation)")
+print(f"   - model_evaluation.png, feature_importance.png (graphiques)")
 
 print("\n" + "=" * 60)
 print("🚀 Le modèle est prêt à être utilisé !")
@@ -347,6 +449,8 @@ exemple = pd.DataFrame({
     'type': ['organic'],
     'region': ['LosAngeles']
 })
+if UTILISER_FEATURES_TEMPORELLES:
+    exemple = feature_store.enrichir(exemple)
 
 prix_predit = pipeline_charge.predict(exemple)[0]
 
@@ -0,0 +1,297 @@
+# ============================================================================
+# 🥑 VALIDATION CROISÉE TEMPORELLE EN PARALLÈLE
+# ============================================================================
+# Le split aléatoire de avocado_prediction.py mélange les semaines : le modèle
+# voit le futur pendant l'entraînement. Ce script évalue le même pipeline en :
+#   - walk_forward : entraînement sur les semaines passées, test sur le bloc
+#     de semaines suivant (plusieurs plis successifs)
+#   - region : plis walk-forward groupés par région (test sur les semaines
+#     suivantes de régions jamais vues, entraînement sur les semaines passées
+#     des autres régions)
+# Les plis sont exécutés en parallèle dans un pool de processus. Les données
+# préparées sont écrites une seule fois en .npy et ouvertes en memory-map par
+# les workers : le DataFrame n'est pas sérialisé pour chaque pli.
+#
+# Usage : python cross_validation.py --mode walk_forward --folds 5 --workers 4
+# ============================================================================
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from xgboost import XGBRegressor
+
+from feature_store import ajouter_features_temporelles, FEATURES_TEMPORELLES
+
+COLONNES_NUMERIQUES = ['Quality1', 'Quality2', 'Quality3', 'Small Bags', 'Large Bags', 'XLarge Bags', 'year']
+COLONNES_CATEGORIQUES = ['type', 'region']
+
+# Les dates sont manipulées en nanosecondes (int64) dans les workers
+NS_PAR_SEMAINE = 7 * 24 * 3600 * 10**9
+
+
+# =============================================================================
+# PRÉPARATION DES DONNÉES
+# =============================================================================
+
+def charger_donnees(chemin, features_temporelles=True):
+    """Charge et nettoie avocado.csv comme l'étape 1 de avocado_prediction.py"""
+    df = pd.read_csv(chemin)
+    df = df.drop(columns=['Unnamed: 0', 'Total Volume', 'Total Bags'])
+    df = df.rename(columns={'4046': 'Quality1', '4225': 'Quality2', '4770': 'Quality3'})
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = df.drop_duplicates()
+    if features_temporelles:
+        df = ajouter_features_temporelles(df)
+    return df.reset_index(drop=True)
+
+
+def construire_pipeline(colonnes_numeriques, n_jobs=1):
+    """Même pipeline et mêmes hyperparamètres que avocado_prediction.py"""
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), colonnes_numeriques),
+            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), COLONNES_CATEGORIQUES)
+        ],
+        remainder='drop'
+    )
+    return Pipeline([
+        ('preprocessor', preprocessor),
+        ('regressor', XGBRegressor(
+            n_estimators=100,
+            max_depth=6,
+            learning_rate=0.1,
+            random_state=42,
+            n_jobs=n_jobs
+        ))
+    ])
+
+
+def ecrire_tableaux(df, colonnes_numeriques, dossier):
+    """
+    Écrit les colonnes utiles en .npy (lus ensuite en memory-map par les workers)
+    et retourne les métadonnées légères transmises aux workers
+    """
+    np.save(os.path.join(dossier, 'num.npy'), df[colonnes_numeriques].to_numpy(dtype=np.float64))
+    np.save(os.path.join(dossier, 'y.npy'), df['AveragePrice'].to_numpy(dtype=np.float64))
+    np.save(os.path.join(dossier, 'date.npy'), df['Date'].to_numpy(dtype='datetime64[ns]').astype(np.int64))
+
+    categories = {}
+    for col in COLONNES_CATEGORIQUES:
+        codes, uniques = pd.factorize(df[col], sort=True)
+        np.save(os.path.join(dossier, f'cat_{col}.npy'), codes.astype(np.int32))
+        categories[col] = list(uniques)
+
+    return {
+        'dossier': dossier,
+        'colonnes_numeriques': colonnes_numeriques,
+        'categories': categories
+    }
+
+
+# =============================================================================
+# DÉFINITION DES PLIS
+# =============================================================================
+
+def plis_walk_forward(dates, n_plis, part_entrainement_min=0.5, ecart_semaines=0):
+    """
+    Plis walk-forward sur les dates uniques : chaque pli teste un bloc de semaines
+    et s'entraîne sur toutes les semaines antérieures (moins un écart optionnel)
+    """
+    uniques = np.unique(dates)
+    debut = int(len(uniques) * part_entrainement_min)
+    plis = []
+    for bloc in np.array_split(uniques[debut:], n_plis):
+        if len(bloc) == 0:
+            continue
+        fin_entrainement = bloc[0] - ecart_semaines * NS_PAR_SEMAINE
+        plis.append({
+            'train_before': int(fin_entrainement),
+            'test_from': int(bloc[0]),
+            'test_to': int(bloc[-1])
+        })
+    return plis
+
+
+def plis_region(dates, n_regions, n_plis, ecart_semaines=0):
+    """
+    Plis groupés par région sur les bornes walk-forward : le pli i teste le bloc
+    de semaines i sur un sous-ensemble de régions et s'entraîne sur les semaines
+    antérieures des autres régions. Sans la borne temporelle, les prix des
+    autres régions la même semaine (très corrélés) feraient fuir le futur.
+    """
+    ordre = np.random.default_rng(42).permutation(n_regions)
+    groupes = [bloc for bloc in np.array_split(ordre, n_plis) if len(bloc)]
+    plis = plis_walk_forward(dates, len(groupes), ecart_semaines=ecart_semaines)
+    return [dict(pli, test_regions=groupe.tolist()) for pli, groupe in zip(plis, groupes)]
+
+
+# =============================================================================
+# WORKERS
+# =============================================================================
+
+# Tableaux ouverts en memory-map, une fois par processus worker
+_DONNEES = {}
+
+
+def _initialiser_worker(meta):
+    dossier = meta['dossier']
+    _DONNEES['meta'] = meta
+    _DONNEES['num'] = np.load(os.path.join(dossier, 'num.npy'), mmap_mode='r')
+    _DONNEES['y'] = np.load(os.path.join(dossier, 'y.npy'), mmap_mode='r')
+    _DONNEES['date'] = np.load(os.path.join(dossier, 'date.npy'), mmap_mode='r')
+    for col in COLONNES_CATEGORIQUES:
+        _DONNEES[f'cat_{col}'] = np.load(os.path.join(dossier, f'cat_{col}.npy'), mmap_mode='r')
+
+
+def _extraire(masque):
+    """Construit le DataFrame d'un sous-ensemble de lignes à partir des memory-maps"""
+    meta = _DONNEES['meta']
+    X = pd.DataFrame(_DONNEES['num'][masque], columns=meta['colonnes_numeriques'])
+    for col in COLONNES_CATEGORIQUES:
+        X[col] = np.asarray(meta['categories'][col], dtype=object)[_DONNEES[f'cat_{col}'][masque]]
+    return X, np.asarray(_DONNEES['y'][masque])
+
+
+def _evaluer_pli(numero, pli, n_jobs):
+    debut_pli = time.time()
+    dates = _DONNEES['date']
+    entrainement = dates < pli['train_before']
+    test = (dates >= pli['test_from']) & (dates <= pli['test_to'])
+    if 'test_regions' in pli:
+        regions_test = np.isin(_DONNEES['cat_region'], pli['test_regions'])
+        entrainement &= ~regions_test
+        test &= regions_test
+
+    X_train, y_train = _extraire(entrainement)
+    X_test, y_test = _extraire(test)
+
+    pipeline = construire_pipeline(_DONNEES['meta']['colonnes_numeriques'], n_jobs=n_jobs)
+    debut = time.time()
+    pipeline.fit(X_train, y_train)
+    duree_fit = time.time() - debut
+
+    debut = time.time()
+    y_pred = pipeline.predict(X_test)
+    duree_predict = time.time() - debut
+
+    resultat = {
+        'fold': numero,
+        'n_train': int(len(y_train)),
+        'n_test': int(len(y_test)),
+        'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred)),
+        'fit_seconds': duree_fit,
+        'predict_seconds': duree_predict,
+        'total_seconds': time.time() - debut_pli
+    }
+    resultat['test_period'] = [
+        str(np.datetime64(pli['test_from'], 'ns').astype('datetime64[D]')),
+        str(np.datetime64(pli['test_to'], 'ns').astype('datetime64[D]'))
+    ]
+    if 'test_regions' in pli:
+        resultat['test_regions'] = [_DONNEES['meta']['categories']['region'][i] for i in pli['test_regions']]
+    return resultat
+
+
+# =============================================================================
+# VALIDATION CROISÉE
+# =============================================================================
+
+def valider(df, mode='walk_forward', n_plis=5, workers=None, ecart_semaines=0, features_temporelles=True):
+    """Exécute la validation croisée en parallèle et retourne le rapport"""
+    colonnes_numeriques = COLONNES_NUMERIQUES + (FEATURES_TEMPORELLES if features_temporelles else [])
+    workers = workers or min(n_plis, os.cpu_count() or 1)
+    # Threads XGBoost par worker : évite de dépasser le nombre de cœurs
+    n_jobs = max(1, (os.cpu_count() or 1) // workers)
+
+    with tempfile.TemporaryDirectory(prefix='avocado_cv_') as dossier:
+        meta = ecrire_tableaux(df, colonnes_numeriques, dossier)
+        dates = df['Date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        if mode == 'walk_forward':
+            plis = plis_walk_forward(dates, n_plis, ecart_semaines=ecart_semaines)
+        elif mode == 'region':
+            plis = plis_region(dates, len(meta['categories']['region']), n_plis, ecart_semaines=ecart_semaines)
+        else:
+            raise ValueError(f'Mode inconnu : {mode}')
+
+        debut = time.time()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initialiser_worker, initargs=(meta,)) as pool:
+            futurs = [pool.submit(_evaluer_pli, i, pli, n_jobs) for i, pli in enumerate(plis)]
+            resultats = [f.result() for f in futurs]
+        duree_totale = time.time() - debut
+
+    metriques = pd.DataFrame(resultats)
+    somme_plis = float(metriques['total_seconds'].sum())
+    return {
+        'mode': mode,
+        'n_folds': len(resultats),
+        'workers': workers,
+        'xgb_threads_per_worker': n_jobs,
+        'gap_weeks': ecart_semaines,
+        'time_features': features_temporelles,
+        'summary': {
+            nom: {
+                'mean': float(metriques[nom].mean()),
+                'std': float(metriques[nom].std(ddof=0))
+            }
+            for nom in ('rmse', 'mae', 'r2')
+        },
+        'timing': {
+            'wall_seconds': duree_totale,
+            'sum_fold_seconds': somme_plis,
+            'parallel_speedup': somme_plis / duree_totale if duree_totale > 0 else None
+        },
+        'folds': resultats
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validation croisée temporelle du modèle avocat')
+    parser.add_argument('--mode', choices=['walk_forward', 'region'], default='walk_forward')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--gap', type=int, default=0, help='Semaines entre la fin de l\'entraînement et le test')
+    parser.add_argument('--sans-features-temporelles', action='store_true')
+    parser.add_argument('--sortie', default='cv_report.json')
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print(f"🔁 VALIDATION CROISÉE ({args.mode})")
+    print("=" * 60)
+
+    features_temporelles = not args.sans_features_temporelles
+    df = charger_donnees(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'avocado.csv'),
+                         features_temporelles=features_temporelles)
+    rapport = valider(df, mode=args.mode, n_plis=args.folds, workers=args.workers,
+                      ecart_semaines=args.gap, features_temporelles=features_temporelles)
+
+    print(f"\n{'Pli':<5}{'Train':>8}{'Test':>8}{'RMSE':>9}{'MAE':>9}{'R²':>9}{'Durée':>9}  Test")
+    for pli in rapport['folds']:
+        detail = ' → '.join(pli['test_period'])
+        if 'test_regions' in pli:
+            detail += ' | ' + ', '.join(pli['test_regions'])
+        print(f"{pli['fold']:<5}{pli['n_train']:>8}{pli['n_test']:>8}"
+              f"{pli['rmse']:>9.4f}{pli['mae']:>9.4f}{pli['r2']:>9.4f}{pli['total_seconds']:>8.1f}s  {detail}")
+
+    resume = rapport['summary']
+    print(f"\n📈 RMSE : {resume['rmse']['mean']:.4f} ± {resume['rmse']['std']:.4f} $")
+    print(f"📈 MAE  : {resume['mae']['mean']:.4f} ± {resume['mae']['std']:.4f} $")
+    print(f"📈 R²   : {resume['r2']['mean']:.4f} ± {resume['r2']['std']:.4f}")
+    print(f"⏱️ Durée : {rapport['timing']['wall_seconds']:.1f}s avec {rapport['workers']} workers "
+          f"(somme des plis : {rapport['timing']['sum_fold_seconds']:.1f}s)")
+
+    with open(args.sortie, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Rapport sauvegardé : {args.sortie}")
@@ -0,0 +1,267 @@
+# ============================================================================
+# 🥑 DISTILLATION DU MODÈLE VERS UN MOTEUR LÉGER (NUMPY)
+# ============================================================================
+# Convertit le pipeline avocado_price_model.pkl (StandardScaler + OneHotEncoder
+# + XGBRegressor) en tableaux NumPy plats (avocado_price_model_lite.npz),
+# évaluables par back/lite_model.py sans scikit-learn, xgboost ni pandas.
+# Vérifie ensuite la parité des prédictions et compare import, latence et
+# mémoire des deux moteurs.
+# ============================================================================
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import joblib
+
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+DOSSIER = os.path.dirname(os.path.abspath(__file__))
+DOSSIER_BACK = os.path.join(DOSSIER, '..', 'back')
+sys.path.insert(0, DOSSIER_BACK)
+
+from lite_model import LiteModel  # noqa: E402
+from feature_store import ajouter_features_temporelles, FEATURES_TEMPORELLES  # noqa: E402
+
+
+# =============================================================================
+# EXTRACTION DES TABLEAUX
+# =============================================================================
+
+def _lire_base_score(param):
+    """base_score est sérialisé sous la forme '1.4E0' ou '[1.4E0,1.5E0]'"""
+    return [float(v) for v in param.strip('[]').split(',')]
+
+
+def extraire_preprocesseur(preprocessor):
+    """Extrait les constantes du ColumnTransformer (moyennes, échelles, catégories)"""
+    tableaux = {}
+    cat_colonnes = []
+
+    for nom, transformer, colonnes in preprocessor.transformers_:
+        if transformer == 'drop' or nom == 'remainder':
+            continue
+        if isinstance(transformer, StandardScaler):
+            # Le moteur léger place les colonnes numériques avant les colonnes one-hot
+            if cat_colonnes:
+                raise ValueError('Les colonnes numériques doivent précéder les colonnes catégoriques')
+            tableaux['num_columns'] = np.array(colonnes, dtype=str)
+            tableaux['num_mean'] = transformer.mean_
+            tableaux['num_scale'] = transformer.scale_
+        elif isinstance(transformer, OneHotEncoder):
+            if transformer.drop is not None:
+                raise ValueError('OneHotEncoder avec drop non supporté')
+            for colonne, categories in zip(colonnes, transformer.categories_):
+                tableaux[f'cat_{len(cat_colonnes)}_categories'] = np.array(categories, dtype=str)
+                cat_colonnes.append(colonne)
+        else:
+            raise ValueError(f'Transformer non supporté : {type(transformer).__name__}')
+
+    tableaux.setdefault('num_columns', np.array([], dtype=str))
+    tableaux.setdefault('num_mean', np.array([], dtype=np.float64))
+    tableaux.setdefault('num_scale', np.array([], dtype=np.float64))
+    tableaux['cat_columns'] = np.array(cat_colonnes, dtype=str)
+    return tableaux
+
+
+def extraire_arbres(booster):
+    """Aplatit les arbres du booster en tableaux de nœuds concaténés"""
+    modele = json.loads(booster.save_raw('json'))['learner']
+    arbres = modele['gradient_booster']['model']['trees']
+    cibles = modele['gradient_booster']['model']['tree_info']
+
+    feature, seuil, gauche, droite, defaut, valeur, racines = [], [], [], [], [], [], []
+    profondeur_max = 0
+    decalage = 0
+
+    for arbre in arbres:
+        if any(arbre.get('split_type', [])):
+            raise ValueError('Splits catégoriels XGBoost non supportés')
+
+        g = np.array(arbre['left_children'], dtype=np.int64)
+        d = np.array(arbre['right_children'], dtype=np.int64)
+        conditions = np.array(arbre['split_conditions'], dtype=np.float32)
+        feuille = g == -1
+        indices = np.arange(len(g))
+
+        # Les feuilles pointent sur elles-mêmes ; leur valeur est dans split_conditions
+        feature.append(np.where(feuille, 0, arbre['split_indices']))
+        seuil.append(np.where(feuille, 0.0, conditions))
+        gauche.append(np.where(feuille, indices, g) + decalage)
+        droite.append(np.where(feuille, indices, d) + decalage)
+        defaut.append(np.array(arbre['default_left'], dtype=bool))
+        valeur.append(np.where(feuille, conditions, 0.0))
+        racines.append(decalage)
+
+        # Profondeur de l'arbre (les parents précèdent toujours leurs enfants)
+        profondeur = np.zeros(len(g), dtype=np.int64)
+        for i in indices[~feuille]:
+            profondeur[g[i]] = profondeur[d[i]] = profondeur[i] + 1
+        profondeur_max = max(profondeur_max, int(profondeur.max()))
+        decalage += len(g)
+
+    return {
+        'node_feature': np.concatenate(feature).astype(np.int32),
+        'node_threshold': np.concatenate(seuil).astype(np.float32),
+        'node_left': np.concatenate(gauche).astype(np.int32),
+        'node_right': np.concatenate(droite).astype(np.int32),
+        'node_default_left': np.concatenate(defaut),
+        'node_value': np.concatenate(valeur).astype(np.float32),
+        'tree_root': np.array(racines, dtype=np.int32),
+        'tree_target': np.array(cibles, dtype=np.int32),
+        'base_score': np.array(_lire_base_score(modele['learner_model_param']['base_score'])),
+        'max_depth': np.array(profondeur_max)
+    }
+
+
+def distiller(pipeline, regresseur=None):
+    """
+    Retourne les tableaux du modèle léger pour un pipeline entraîné
+
+    `regresseur` permet de distiller un autre booster (ex : modèle de quantiles)
+    entraîné sur la sortie du même préprocesseur
+    """
+    if regresseur is None:
+        regresseur = pipeline.named_steps['regressor']
+    tableaux = extraire_preprocesseur(pipeline.named_steps['preprocessor'])
+    tableaux.update(extraire_arbres(regresseur.get_booster()))
+    return tableaux
+
+
+# =============================================================================
+# COMPARAISON DES MOTEURS
+# =============================================================================
+
+# Mesure, dans un processus neuf, le temps d'import + chargement et la mémoire résidente
+CODE_MESURE = """
+import json, resource, sys, time
+debut = time.perf_counter()
+if sys.argv[1] == 'pipeline':
+    import joblib
+    modele = joblib.load(sys.argv[2])
+else:
+    sys.path.insert(0, sys.argv[3])
+    from lite_model import LiteModel
+    modele = LiteModel.load(sys.argv[2])
+duree = time.perf_counter() - debut
+# VmRSS plutôt que ru_maxrss : ce dernier hérite du pic du processus parent
+try:
+    with open('/proc/self/status') as f:
+        rss = next(int(l.split()[1]) for l in f if l.startswith('VmRSS')) / 1024
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({'startup_s': duree, 'rss_mb': rss}))
+"""
+
+
+def mesurer_demarrage(moteur, chemin):
+    sortie = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', CODE_MESURE, moteur, chemin, DOSSIER_BACK],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+def mesurer_latence(predict, X, repetitions):
+    """Latence médiane (ms) d'un appel de prédiction"""
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        predict(X)
+        durees.append(time.perf_counter() - debut)
+    return float(np.median(durees)) * 1000
+
+
+def charger_features(chemin_csv, colonnes_modele):
+    """Charge avocado.csv avec les colonnes de l'API (et les features temporelles si besoin)"""
+    df = pd.read_csv(chemin_csv)
+    df = df.rename(columns={'4046': 'Quality1', '4225': 'Quality2', '4770': 'Quality3'})
+    if set(FEATURES_TEMPORELLES) & set(colonnes_modele):
+        df['Date'] = pd.to_datetime(df['Date'])
+        df = ajouter_features_temporelles(df)
+    return df
+
+
+# =============================================================================
+# EXÉCUTION
+# =============================================================================
+
+if __name__ == '__main__':
+    chemin_pkl = os.path.join(DOSSIER, 'avocado_price_model.pkl')
+    chemin_npz = os.path.join(DOSSIER, 'avocado_price_model_lite.npz')
+    chemin_quantiles_pkl = os.path.join(DOSSIER, 'avocado_quantile_model.pkl')
+    chemin_quantiles_npz = os.path.join(DOSSIER, 'avocado_quantile_model_lite.npz')
+
+    print("\n" + "=" * 60)
+    print("🪶 DISTILLATION DU MODÈLE VERS NUMPY")
+    print("=" * 60)
+
+    pipeline = joblib.load(chemin_pkl)
+    np.savez_compressed(chemin_npz, **distiller(pipeline))
+    lite = LiteModel.load(chemin_npz)
+
+    print(f"✅ Modèle léger sauvegardé : {os.path.basename(chemin_npz)}")
+    print(f"📦 Taille : {os.path.getsize(chemin_npz) / 1024:.1f} Ko "
+          f"(pickle : {os.path.getsize(chemin_pkl) / 1024:.1f} Ko)")
+    print(f"🌳 Arbres : {len(lite.racines)} | Nœuds : {len(lite.feature)} | Profondeur max : {lite.profondeur}")
+
+    # Test de parité sur tout le dataset
+    X = charger_features(os.path.join(DOSSIER, 'avocado.csv'), lite.colonnes_numeriques)
+    y_pipeline = pipeline.predict(X)
+    y_lite = lite.predict(X)
+    ecart_max = float(np.max(np.abs(y_pipeline - y_lite)))
+
+    print("\n" + "-" * 50)
+    print("🔍 TEST DE PARITÉ")
+    print("-" * 50)
+    print(f"   - Lignes comparées : {len(X)}")
+    print(f"   - Écart maximal : {ecart_max:.2e} $")
+    if not np.allclose(y_pipeline, y_lite, atol=1e-4):
+        print("❌ Les prédictions du modèle léger divergent du pipeline !")
+        sys.exit(1)
+    print("✅ Prédictions identiques (tolérance 1e-4 $)")
+
+    # Modèle de quantiles optionnel : même préprocesseur, booster multi-quantiles
+    if os.path.exists(chemin_quantiles_pkl):
+        modele_quantiles = joblib.load(chemin_quantiles_pkl)
+        np.savez_compressed(chemin_quantiles_npz, **distiller(pipeline, modele_quantiles))
+        lite_quantiles = LiteModel.load(chemin_quantiles_npz)
+
+        matrice = pipeline.named_steps['preprocessor'].transform(X)
+        ecart_max = float(np.max(np.abs(modele_quantiles.predict(matrice) - lite_quantiles.predict(X))))
+        print(f"\n✅ Modèle de quantiles distillé : {os.path.basename(chemin_quantiles_npz)}")
+        print(f"   - Écart maximal : {ecart_max:.2e} $")
+        if ecart_max > 1e-4:
+            print("❌ Les quantiles du modèle léger divergent du modèle d'origine !")
+            sys.exit(1)
+
+    # Comparaison démarrage / mémoire / latence
+    print("\n" + "-" * 50)
+    print("⏱️ COMPARAISON DES MOTEURS")
+    print("-" * 50)
+    demarrage = {
+        'pipeline': mesurer_demarrage('pipeline', chemin_pkl),
+        'lite': mesurer_demarrage('lite', chemin_npz)
+    }
+    ligne = X.head(1)
+    lot = X.head(1000)
+    latences = {
+        'pipeline': (mesurer_latence(pipeline.predict, ligne, 200), mesurer_latence(pipeline.predict, lot, 20)),
+        'lite': (mesurer_latence(lite.predict, ligne, 200), mesurer_latence(lite.predict, lot, 20))
+    }
+
+    print(f"\n{'Moteur':<10}{'Import+chargement':>20}{'RSS':>12}{'1 ligne':>12}{'1000 lignes':>14}")
+    for moteur in ('pipeline', 'lite'):
+        print(f"{moteur:<10}"
+              f"{demarrage[moteur]['startup_s'] * 1000:>17.0f} ms"
+              f"{demarrage[moteur]['rss_mb']:>9.0f} Mo"
+              f"{latences[moteur][0]:>9.2f} ms"
+              f"{latences[moteur][1]:>11.2f} ms")
+
+    print("\n" + "=" * 60)
+    print("🚀 Lancer le backend avec AVOCADO_ENGINE=lite pour utiliser ce moteur")
+    print("=" * 60)
@@ -0,0 +1,274 @@
+# ============================================================================
+# 🥑 ÉVALUATION DU MODÈLE - RAPPORT JSON ET GRAPHIQUES SANS AFFICHAGE
+# ============================================================================
+# Calcule en une passe les métriques globales, par région et par type, les
+# quantiles des résidus et l'importance des features, puis génère les
+# graphiques avec le backend matplotlib non interactif "Agg" dans un
+# processus séparé (aucune fenêtre, compatible avec les machines sans écran).
+#
+# Usage direct (rendu des graphiques, appelé par lancer_graphiques) :
+#   python evaluation.py --graphiques donnees.npz model_evaluation.png
+# ============================================================================
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Nombre maximal de points affichés dans le nuage de points
+MAX_POINTS_SCATTER = 5000
+
+# Quantiles des résidus reportés
+QUANTILES_RESIDUS = [0.01, 0.05, 0.10, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99]
+
+
+# =============================================================================
+# MÉTRIQUES
+# =============================================================================
+
+def _metriques(y_reel, y_pred):
+    erreurs = y_reel - y_pred
+    variance = np.sum((y_reel - y_reel.mean()) ** 2)
+    return {
+        'n': int(len(y_reel)),
+        'rmse': float(np.sqrt(np.mean(erreurs ** 2))),
+        'mae': float(np.mean(np.abs(erreurs))),
+        'bias': float(np.mean(erreurs)),
+        'r2': float(1 - np.sum(erreurs ** 2) / variance) if variance > 0 else None
+    }
+
+
+def _metriques_par_groupe(df, colonne):
+    """Métriques par modalité calculées en un seul groupby vectorisé"""
+    groupes = df.groupby(colonne)
+    agregats = groupes.agg(
+        n=('erreur', 'size'),
+        mse=('erreur2', 'mean'),
+        mae=('erreur_abs', 'mean'),
+        bias=('erreur', 'mean'),
+        ss_res=('erreur2', 'sum')
+    )
+    # R² par groupe : somme des carrés totaux autour de la moyenne du groupe
+    moyenne = groupes['y_reel'].transform('mean')
+    agregats['ss_tot'] = ((df['y_reel'] - moyenne) ** 2).groupby(df[colonne]).sum()
+
+    resultat = {}
+    for modalite, ligne in agregats.iterrows():
+        resultat[str(modalite)] = {
+            'n': int(ligne['n']),
+            'rmse': float(np.sqrt(ligne['mse'])),
+            'mae': float(ligne['mae']),
+            'bias': float(ligne['bias']),
+            'r2': float(1 - ligne['ss_res'] / ligne['ss_tot']) if ligne['ss_tot'] > 0 else None
+        }
+    return resultat
+
+
+def importance_features(pipeline):
+    """Importance des features du régresseur, avec les noms en sortie du préprocesseur"""
+    noms = pipeline.named_steps['preprocessor'].get_feature_names_out()
+    importances = pipeline.named_steps['regressor'].feature_importances_
+    ordre = np.argsort(importances)[::-1]
+    return {str(noms[i]): float(importances[i]) for i in ordre}
+
+
+def evaluer(pipeline, X_train, y_train, X_test, y_test):
+    """
+    Évalue le pipeline et retourne (rapport, y_train_pred, y_test_pred)
+
+    Les ensembles d'entraînement et de test sont prédits en un seul appel.
+    """
+    predictions = pipeline.predict(pd.concat([X_train, X_test], ignore_index=True))
+    y_train_pred = predictions[:len(X_train)]
+    y_test_pred = predictions[len(X_train):]
+
+    y_train = np.asarray(y_train, dtype=np.float64)
+    y_test = np.asarray(y_test, dtype=np.float64)
+
+    residus = pd.DataFrame({
+        'y_reel': y_test,
+        'erreur': y_test - y_test_pred,
+        'type': np.asarray(X_test['type']),
+        'region': np.asarray(X_test['region'])
+    })
+    residus['erreur2'] = residus['erreur'] ** 2
+    residus['erreur_abs'] = residus['erreur'].abs()
+
+    rapport = {
+        'train': _metriques(y_train, y_train_pred),
+        'test': _metriques(y_test, y_test_pred),
+        'test_by_type': _metriques_par_groupe(residus, 'type'),
+        'test_by_region': _metriques_par_groupe(residus, 'region'),
+        'residual_quantiles': {
+            f'p{round(q * 100):02d}': float(v)
+            for q, v in zip(QUANTILES_RESIDUS, np.quantile(residus['erreur'], QUANTILES_RESIDUS))
+        },
+        'feature_importances': importance_features(pipeline)
+    }
+    return rapport, y_train_pred, y_test_pred
+
+
+def _latence_mediane(fonction, X, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction(X)
+        durees.append(time.perf_counter() - debut)
+    return float(np.median(durees)) * 1000
+
+
+def evaluer_quantiles(pipeline, modele_quantiles, quantiles, X_test, y_test):
+    """
+    Évalue les intervalles de prédiction (couverture, largeur, perte pinball) et
+    mesure la latence ajoutée par rapport au pipeline seul. Le modèle de quantiles
+    est évalué sur la même matrice prétraitée que le régresseur principal.
+    """
+    preprocessor = pipeline.named_steps['preprocessor']
+    regressor = pipeline.named_steps['regressor']
+
+    def predire_avec_intervalles(X):
+        matrice = preprocessor.transform(X)
+        return regressor.predict(matrice), np.sort(modele_quantiles.predict(matrice), axis=1)
+
+    y_test = np.asarray(y_test, dtype=np.float64)
+    _, y_quantiles = predire_avec_intervalles(X_test)
+    bas, haut = y_quantiles[:, 0], y_quantiles[:, -1]
+
+    pinball = {}
+    for j, q in enumerate(quantiles):
+        ecart = y_test - y_quantiles[:, j]
+        pinball[f'p{round(q * 100):02d}'] = float(np.mean(np.maximum(q * ecart, (q - 1) * ecart)))
+
+    latence = {}
+    for nom, lignes in (('single_row', X_test.head(1)), ('batch_1000', X_test.head(1000))):
+        repetitions = 200 if len(lignes) == 1 else 20
+        point = _latence_mediane(pipeline.predict, lignes, repetitions)
+        intervalles = _latence_mediane(predire_avec_intervalles, lignes, repetitions)
+        latence[nom] = {
+            'point_ms': point,
+            'with_intervals_ms': intervalles,
+            'extra_ms': intervalles - point
+        }
+
+    return {
+        'quantiles': list(quantiles),
+        'coverage': float(np.mean((y_test >= bas) & (y_test <= haut))),
+        'expected_coverage': float(quantiles[-1] - quantiles[0]),
+        'mean_width': float(np.mean(haut - bas)),
+        'pinball_loss': pinball,
+        'latency': latence
+    }
+
+
+def sauvegarder_rapport(rapport, chemin):
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+
+
+# =============================================================================
+# GRAPHIQUES
+# =============================================================================
+
+def lancer_graphiques(y_test, y_pred, rapport, chemin_png, max_points=MAX_POINTS_SCATTER):
+    """
+    Lance le rendu des graphiques dans un processus séparé et retourne le processus
+    (à attendre avec .wait()). Le nuage de points est sous-échantillonné au-delà
+    de `max_points` ; l'histogramme utilise toutes les erreurs.
+    """
+    y_test = np.asarray(y_test, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+
+    indices = np.arange(len(y_test))
+    if len(indices) > max_points:
+        indices = np.sort(np.random.default_rng(42).choice(indices, max_points, replace=False))
+
+    top = list(rapport['feature_importances'].items())[:15]
+    fd, chemin_donnees = tempfile.mkstemp(suffix='.npz', prefix='avocado_eval_')
+    os.close(fd)
+    np.savez(
+        chemin_donnees,
+        scatter_reel=y_test[indices],
+        scatter_pred=y_pred[indices],
+        erreurs=y_test - y_pred,
+        y_min=np.min(y_test),
+        y_max=np.max(y_test),
+        r2=rapport['test']['r2'],
+        rmse=rapport['test']['rmse'],
+        importance_noms=np.array([nom for nom, _ in top], dtype=str),
+        importance_valeurs=np.array([valeur for _, valeur in top])
+    )
+
+    # Un sous-processus Python plutôt que multiprocessing : avec la méthode
+    # "spawn" (Windows, macOS), multiprocessing réimporterait le script
+    # d'entraînement appelant, qui n'a pas de garde __main__
+    env = dict(os.environ, MPLBACKEND='Agg')
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--graphiques', chemin_donnees, chemin_png],
+        env=env
+    )
+
+
+def dessiner_graphiques(chemin_donnees, chemin_png):
+    """Génère model_evaluation.png et feature_importance.png (backend Agg)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.style.use('seaborn-v0_8-whitegrid')
+    with np.load(chemin_donnees) as d:
+        donnees = {cle: d[cle] for cle in d.files}
+    os.remove(chemin_donnees)
+
+    r2 = float(donnees['r2'])
+    rmse = float(donnees['rmse'])
+    y_min, y_max = float(donnees['y_min']), float(donnees['y_max'])
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+
+    # Graphique 1 : Scatter plot (sous-échantillonné)
+    ax1 = axes[0]
+    ax1.scatter(donnees['scatter_reel'], donnees['scatter_pred'], alpha=0.5, edgecolors='k', linewidth=0.5)
+    ax1.plot([y_min, y_max], [y_min, y_max], 'r--', lw=2, label='Prédiction parfaite')
+    ax1.set_xlabel('Prix Réel ($)', fontsize=12)
+    ax1.set_ylabel('Prix Prédit ($)', fontsize=12)
+    ax1.set_title(f'Prédictions vs Valeurs Réelles\nR² = {r2:.4f}', fontsize=14)
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+
+    # Graphique 2 : Distribution des erreurs
+    ax2 = axes[1]
+    ax2.hist(donnees['erreurs'], bins=50, edgecolor='black', alpha=0.7, color='steelblue')
+    ax2.axvline(x=0, color='red', linestyle='--', linewidth=2, label='Erreur = 0')
+    ax2.set_xlabel('Erreur de prédiction ($)', fontsize=12)
+    ax2.set_ylabel('Fréquence', fontsize=12)
+    ax2.set_title(f'Distribution des Erreurs\nRMSE = {rmse:.4f} $', fontsize=14)
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(chemin_png, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+
+    # Graphique 3 : Importance des features
+    noms = donnees['importance_noms'][::-1]
+    fig, ax = plt.subplots(figsize=(8, 6))
+    ax.barh([str(n) for n in noms], donnees['importance_valeurs'][::-1], color='seagreen')
+    ax.set_xlabel('Importance (gain)', fontsize=12)
+    ax.set_title('Importance des features', fontsize=14)
+    plt.tight_layout()
+    chemin_importance = os.path.join(os.path.dirname(chemin_png) or '.', 'feature_importance.png')
+    plt.savefig(chemin_importance, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rendu des graphiques d\'évaluation')
+    parser.add_argument('--graphiques', nargs=2, metavar=('DONNEES_NPZ', 'SORTIE_PNG'), required=True)
+    args = parser.parse_args()
+    dessiner_graphiques(*args.graphiques)
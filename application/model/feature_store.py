@@ -0,0 +1,233 @@
+# ============================================================================
+# 🥑 FEATURES TEMPORELLES ET FEATURE STORE INCRÉMENTAL
+# ============================================================================
+# - ajouter_features_temporelles : calcule semaine de l'année, prix décalés et
+#   moyennes glissantes par (region, type) sur tout l'historique, de façon
+#   vectorisée (groupby / shift / rolling), pour l'entraînement. Chaque série
+#   est complétée semaine par semaine : une semaine absente donne un prix
+#   manquant, et les décalages comptent en semaines calendaires.
+# - FeatureStore : conserve uniquement la fin de l'historique de chaque série
+#   (region, type) et les features de la semaine suivante, pour que l'ajout
+#   d'une semaine ne recalcule que les séries concernées et que le backend
+#   retrouve les features d'une requête en O(1).
+#
+# Ajout de nouvelles semaines observées au store sauvegardé (le backend relit
+# le fichier quand il change) :
+#   python feature_store.py --ajouter nouvelles_semaines.csv
+# ============================================================================
+
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Clé d'une série de prix
+CLES = ['region', 'type']
+
+# Décalages (en semaines) et fenêtres des moyennes glissantes
+DECALAGES = (1, 2, 4)
+FENETRES = (4, 12)
+
+FEATURES_TEMPORELLES = (
+    ['week_of_year']
+    + [f'price_lag_{k}' for k in DECALAGES]
+    + [f'price_rolling_mean_{w}' for w in FENETRES]
+)
+
+# Nombre de semaines d'historique nécessaires pour calculer toutes les features
+TAILLE_HISTORIQUE = max(max(DECALAGES), max(FENETRES))
+
+# Origine des numéros de semaine : un lundi, pour qu'une semaine aille du lundi
+# au dimanche (les dates de avocado.csv sont les dimanches clôturant la semaine)
+ORIGINE_SEMAINES = pd.Timestamp('1970-01-05')
+
+FICHIER_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'avocado_feature_store.pkl')
+
+
+def semaine_de_l_annee(dates):
+    """Semaine ISO de l'année d'une série de dates (NaN pour une date manquante)"""
+    return pd.to_datetime(dates).dt.isocalendar().week.to_numpy(dtype=float, na_value=np.nan)
+
+
+def numero_de_semaine(dates):
+    """Numéro de semaine calendaire (lundi -> dimanche) d'une série de dates"""
+    return (pd.to_datetime(dates) - ORIGINE_SEMAINES).dt.days // 7
+
+
+def ajouter_features_temporelles(df):
+    """
+    Ajoute les features temporelles à un DataFrame contenant Date, AveragePrice,
+    region et type. Les features d'une ligne n'utilisent que les semaines
+    précédentes de la même série (pas de fuite de la cible).
+
+    Retourne une copie dans l'ordre d'origine des lignes.
+    """
+    trie = df.sort_values(CLES + ['Date']).copy()
+    trie['week_of_year'] = semaine_de_l_annee(trie['Date'])
+
+    # Prix indexés par (region, type, semaine), puis complétés semaine par semaine
+    # entre la première et la dernière semaine de chaque série : shift et rolling
+    # comptent ainsi en semaines calendaires, même s'il manque des semaines
+    semaines = numero_de_semaine(trie['Date']).to_numpy()
+    index_lignes = pd.MultiIndex.from_arrays(
+        [trie[c].to_numpy() for c in CLES] + [semaines], names=CLES + ['semaine'])
+    prix = pd.Series(trie['AveragePrice'].to_numpy(), index=index_lignes)
+    prix = prix[~prix.index.duplicated(keep='last')]
+    bornes = pd.Series(semaines).groupby([trie[c].to_numpy() for c in CLES], sort=False).agg(['min', 'max'])
+    grille = pd.MultiIndex.from_tuples(
+        [(*cle, s) for cle, debut, fin in zip(bornes.index, bornes['min'], bornes['max'])
+         for s in range(debut, fin + 1)],
+        names=CLES + ['semaine'])
+    hebdomadaire = prix.reindex(grille)
+
+    groupes = hebdomadaire.groupby(level=CLES, sort=False)
+    for k in DECALAGES:
+        trie[f'price_lag_{k}'] = groupes.shift(k).reindex(index_lignes).to_numpy()
+
+    groupes_precedent = groupes.shift(1).groupby(level=CLES, sort=False)
+    for w in FENETRES:
+        trie[f'price_rolling_mean_{w}'] = (
+            groupes_precedent.rolling(w, min_periods=1).mean()
+            .droplevel(list(range(len(CLES))))
+            .reindex(index_lignes).to_numpy()
+        )
+
+    return trie.loc[df.index]
+
+
+class FeatureStore:
+    """
+    Feature store incrémental des séries de prix (region, type)
+
+    - historique : clé -> (dates, prix) des TAILLE_HISTORIQUE dernières semaines
+    - features : clé -> features de la semaine suivant la dernière date connue
+    """
+
+    def __init__(self):
+        self.historique = {}
+        self.features = {}
+
+    @classmethod
+    def depuis_dataframe(cls, df):
+        """Construit le store à partir de l'historique complet"""
+        store = cls()
+        store.ajouter(df)
+        return store
+
+    def ajouter(self, df):
+        """
+        Ajoute de nouvelles semaines (colonnes Date, AveragePrice, region, type).
+        Seules les séries présentes dans `df` sont recalculées.
+        """
+        nouveau = df[CLES + ['Date', 'AveragePrice']].copy()
+        nouveau['Date'] = pd.to_datetime(nouveau['Date'])
+
+        for cle, lignes in nouveau.groupby(CLES, sort=False):
+            dates, prix = self.historique.get(cle, ([], []))
+            serie = pd.Series(
+                list(prix) + lignes['AveragePrice'].tolist(),
+                index=list(dates) + lignes['Date'].tolist()
+            )
+            # Une semaine déjà connue est remplacée par sa nouvelle valeur, et seules
+            # les TAILLE_HISTORIQUE dernières semaines calendaires sont conservées
+            serie = serie.sort_index(kind='stable')
+            semaines = numero_de_semaine(serie.index.to_series()).to_numpy()
+            garder = ~pd.Series(semaines).duplicated(keep='last').to_numpy()
+            garder &= semaines > semaines.max() - TAILLE_HISTORIQUE
+            serie = serie[garder]
+
+            self.historique[cle] = (list(serie.index), serie.tolist())
+            self.features[cle] = self._calculer(list(serie.index), serie.to_numpy())
+
+    @staticmethod
+    def _calculer(dates, prix):
+        """
+        Features de la semaine suivant la dernière date de la série, en semaines
+        calendaires : une semaine absente de l'historique donne un prix manquant
+        """
+        prochaine_date = dates[-1] + pd.Timedelta(weeks=1)
+        semaines = numero_de_semaine(pd.Series(dates)).to_numpy()
+        prix_par_semaine = dict(zip(semaines.tolist(), np.asarray(prix, dtype=float).tolist()))
+        prochaine = int(semaines[-1]) + 1
+        features = {
+            'next_date': prochaine_date,
+            'week_of_year': int(prochaine_date.isocalendar().week)
+        }
+        for k in DECALAGES:
+            features[f'price_lag_{k}'] = prix_par_semaine.get(prochaine - k, np.nan)
+        for w in FENETRES:
+            fenetre = [prix_par_semaine[s] for s in range(prochaine - w, prochaine) if s in prix_par_semaine]
+            features[f'price_rolling_mean_{w}'] = float(np.mean(fenetre)) if fenetre else np.nan
+        return features
+
+    def lookup(self, region, type_avocat):
+        """Features de la semaine suivante pour une série (None si inconnue)"""
+        return self.features.get((region, type_avocat))
+
+    def enrichir(self, df):
+        """
+        Ajoute les features temporelles à des lignes de requête (region, type et,
+        optionnellement, Date). Une série inconnue donne des valeurs manquantes.
+
+        Seule la semaine suivant l'historique connu (next_date) peut être prédite
+        avec les prix décalés et les moyennes glissantes : pour une autre Date,
+        ces features sont manquantes (comme pour une série inconnue) plutôt que
+        de mélanger la saison d'une semaine avec les prix d'une autre.
+        """
+        vide = dict.fromkeys(FEATURES_TEMPORELLES + ['next_date'], np.nan)
+        lignes = [
+            self.features.get(cle, vide)
+            for cle in zip(df['region'], df['type'])
+        ]
+        enrichi = df.copy()
+        for col in FEATURES_TEMPORELLES:
+            enrichi[col] = [ligne[col] for ligne in lignes]
+
+        if 'Date' in df.columns:
+            dates = pd.to_datetime(df['Date'], errors='coerce')
+            # La semaine de la requête prime sur la semaine suivant l'historique
+            semaines = semaine_de_l_annee(dates)
+            enrichi['week_of_year'] = np.where(np.isnan(semaines), enrichi['week_of_year'], semaines)
+
+            prochaines = pd.to_datetime(pd.Series([ligne['next_date'] for ligne in lignes], index=df.index))
+            autre_semaine = (dates.notna() & (numero_de_semaine(dates) != numero_de_semaine(prochaines))).to_numpy()
+            if autre_semaine.any():
+                colonnes_prix = [col for col in FEATURES_TEMPORELLES if col != 'week_of_year']
+                enrichi.loc[autre_semaine, colonnes_prix] = np.nan
+
+        return enrichi
+
+    def sauvegarder(self, chemin):
+        """
+        Sauvegarde l'historique (structures Python simples) avec joblib. Le
+        fichier est remplacé d'un bloc : un backend qui le relit ne voit jamais
+        un fichier à moitié écrit.
+        """
+        temporaire = f'{chemin}.tmp'
+        joblib.dump({'historique': self.historique}, temporaire)
+        os.replace(temporaire, chemin)
+
+    @classmethod
+    def charger(cls, chemin):
+        store = cls()
+        for cle, (dates, prix) in joblib.load(chemin)['historique'].items():
+            store.historique[cle] = (dates, prix)
+            store.features[cle] = cls._calculer(dates, prix)
+        return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ajout de semaines observées au feature store')
+    parser.add_argument('--ajouter', required=True,
+                        help='CSV des semaines observées (colonnes Date, AveragePrice, region, type)')
+    parser.add_argument('--store', default=FICHIER_STORE, help='Feature store à mettre à jour')
+    args = parser.parse_args()
+
+    store = FeatureStore.charger(args.store)
+    semaines = pd.read_csv(args.ajouter)
+    store.ajouter(semaines)
+    store.sauvegarder(args.store)
+    print(f"✅ {len(semaines)} ligne(s) ajoutée(s) : {semaines.groupby(CLES).ngroups} série(s) recalculée(s)")
+    print(f"💾 Feature store sauvegardé : {args.store}")
@@ -0,0 +1,114 @@
+# ============================================================================
+# 🥑 REJEU DU JOURNAL DES PRÉDICTIONS POUR LE RÉENTRAÎNEMENT
+# ============================================================================
+# Relit les fichiers predictions-*.ndjson.gz écrits par le backend
+# (back/prediction_log.py), y associe les prix réellement observés et produit
+# un CSV au format de avocado.csv, que avocado_prediction.py ajoute aux
+# données d'entraînement via la variable d'environnement AVOCADO_EXTRA_DATA.
+#
+# Les prix observés (fichier --labels) sont associés :
+#   - par identifiant de prédiction si le fichier a une colonne "prediction_id"
+#   - sinon par semaine et série (colonnes Date, region, type)
+#
+# Usage :
+#   python replay_log.py --labels prix_observes.csv --sortie replay.csv
+#   AVOCADO_EXTRA_DATA=replay.csv python avocado_prediction.py
+# ============================================================================
+
+import argparse
+import glob
+import gzip
+import json
+import os
+
+import pandas as pd
+
+# Dossier par défaut du journal (voir AVOCADO_PREDICTION_LOG_DIR côté backend)
+DOSSIER_JOURNAL = os.path.join(os.path.dirname(__file__), '..', 'back', 'prediction_logs')
+
+# Colonnes de avocado.csv (la première colonne est l'index sans nom)
+COLONNES_AVOCADO = ['Date', 'AveragePrice', 'Total Volume', '4046', '4225', '4770', 'Total Bags',
+                    'Small Bags', 'Large Bags', 'XLarge Bags', 'type', 'year', 'region']
+
+RENOMMAGE_INVERSE = {'Quality1': '4046', 'Quality2': '4225', 'Quality3': '4770'}
+
+
+def lire_journal(dossier):
+    """
+    Lit tous les enregistrements du journal en un DataFrame à plat (une ligne
+    par prédiction). Un fichier tronqué (arrêt brutal pendant une écriture)
+    est lu jusqu'au dernier lot complet.
+    """
+    lignes = []
+    fichiers = sorted(glob.glob(os.path.join(dossier, 'predictions-*.ndjson.gz')))
+    for chemin in fichiers:
+        try:
+            with gzip.open(chemin, 'rt', encoding='utf-8') as f:
+                for ligne in f:
+                    enregistrement = json.loads(ligne)
+                    lignes.append({
+                        'prediction_id': enregistrement['id'],
+                        'timestamp': enregistrement['timestamp'],
+                        'prediction': enregistrement['prediction'],
+                        **enregistrement['input']
+                    })
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            print(f"⚠️ Fichier tronqué, lu jusqu'au dernier lot complet : {os.path.basename(chemin)}")
+    print(f"📂 {len(lignes)} prédictions lues dans {len(fichiers)} fichier(s)")
+    return pd.DataFrame(lignes)
+
+
+def semaine_de_la_prediction(journal):
+    """
+    Date de la semaine prédite : le champ optionnel "Date" de la requête, sinon
+    le dimanche clôturant la semaine de la requête (convention de avocado.csv)
+    """
+    instants = pd.to_datetime(journal['timestamp'], utc=True).dt.tz_localize(None)
+    semaines = instants.dt.to_period('W-SUN').dt.end_time.dt.normalize()
+    if 'Date' in journal.columns:
+        dates = pd.to_datetime(journal['Date'], errors='coerce')
+        return dates.fillna(semaines).dt.normalize()
+    return semaines
+
+
+def rejouer(journal, labels):
+    """Associe les prix observés au journal et retourne un DataFrame au format avocado.csv"""
+    journal = journal.copy()
+    journal['Date'] = semaine_de_la_prediction(journal)
+
+    labels = labels[[c for c in labels.columns if c in ('prediction_id', 'Date', 'region', 'type', 'AveragePrice')]]
+    if 'prediction_id' in labels.columns:
+        cles = ['prediction_id']
+    else:
+        cles = ['Date', 'region', 'type']
+        labels = labels.assign(Date=pd.to_datetime(labels['Date']))
+    donnees = journal.merge(labels[cles + ['AveragePrice']], on=cles, how='inner')
+
+    # Une seule ligne par semaine et par série : la dernière requête l'emporte
+    donnees = (donnees.sort_values('timestamp')
+               .drop_duplicates(['Date', 'region', 'type'], keep='last')
+               .rename(columns=RENOMMAGE_INVERSE))
+
+    donnees['Total Bags'] = donnees[['Small Bags', 'Large Bags', 'XLarge Bags']].sum(axis=1)
+    donnees['Total Volume'] = donnees[['4046', '4225', '4770', 'Total Bags']].sum(axis=1)
+    donnees['Date'] = donnees['Date'].dt.strftime('%Y-%m-%d')
+    return donnees[COLONNES_AVOCADO].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rejeu du journal des prédictions pour le réentraînement')
+    parser.add_argument('--journal', default=DOSSIER_JOURNAL, help='Dossier des fichiers predictions-*.ndjson.gz')
+    parser.add_argument('--labels', required=True,
+                        help='CSV des prix observés : prediction_id + AveragePrice, ou Date + region + type + AveragePrice')
+    parser.add_argument('--sortie', default='replay.csv', help='CSV produit (format avocado.csv)')
+    args = parser.parse_args()
+
+    journal = lire_journal(args.journal)
+    if journal.empty:
+        raise SystemExit("❌ Journal vide : aucune prédiction à rejouer")
+
+    donnees = rejouer(journal, pd.read_csv(args.labels))
+    donnees.to_csv(args.sortie)
+    print(f"✅ {len(donnees)} lignes étiquetées écrites dans {args.sortie}")
+    print(f"   ({len(journal) - len(donnees)} prédictions sans prix observé ou en double ignorées)")
+    print(f"   Réentraînement : AVOCADO_EXTRA_DATA={args.sortie} python avocado_prediction.py")